@@ -0,0 +1,149 @@
+"""
+Whole-graph separation statistics for the degrees dataset.
+
+Usage: python analytics.py [directory] [--source NAME] [--samples N]
+
+Breadth-first search runs level by level as sparse matrix-vector products
+over the person x movie incidence matrix, so a single pass gives the
+distance from a source to every person at once.
+"""
+
+import sys
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+import degrees
+
+
+def main():
+    args = sys.argv[1:]
+    source = None
+    samples = 10
+    try:
+        if "--source" in args:
+            i = args.index("--source")
+            source = args[i + 1]
+            del args[i:i + 2]
+        if "--samples" in args:
+            i = args.index("--samples")
+            samples = int(args[i + 1])
+            del args[i:i + 2]
+    except (IndexError, ValueError):
+        sys.exit("Usage: python analytics.py [directory] [--source NAME] [--samples N]")
+    if len(args) > 1:
+        sys.exit("Usage: python analytics.py [directory] [--source NAME] [--samples N]")
+    directory = args[0] if args else "large"
+
+    print("Loading data...")
+    degrees.load_data(directory)
+    print("Data loaded.")
+    graph = degrees.graph
+    incidence = incidence_matrix(graph)
+
+    count, labels = components(incidence)
+    sizes = np.bincount(labels)
+    print(f"{graph.num_people()} people, {graph.num_movies()} movies, {graph.num_credits()} credits")
+    print(f"{count} connected components, largest has {sizes.max() if count else 0} people")
+
+    if source is not None:
+        person_id = degrees.person_id_for_name(source, policy="most_movies")
+        if person_id is None:
+            sys.exit("Person not found.")
+        histogram, unreachable = separation_histogram(distances(incidence, graph.person_index[person_id]))
+        print(f"Degrees of separation from {degrees.people[person_id]['name']}:")
+        for level, people in enumerate(histogram):
+            print(f"  {level}: {people}")
+        print(f"  not connected: {unreachable}")
+
+    if samples > 0 and graph.num_people() > 0:
+        rng = np.random.default_rng(0)
+        sources = rng.choice(graph.num_people(), size=min(samples, graph.num_people()), replace=False)
+        print("Eccentricity samples:")
+        for p, value in zip(sources, eccentricities(incidence, sources)):
+            print(f"  {degrees.people[graph.person_ids[p]]['name']}: {value}")
+
+
+def incidence_matrix(graph):
+    """
+    Return the people x movies incidence matrix of `graph` as a sparse
+    CSR matrix, sharing the index arrays of the graph without copying.
+    """
+    indptr = np.frombuffer(graph.person_offsets, dtype=np.intc)
+    indices = np.frombuffer(graph.person_movies, dtype=np.intc)
+    data = np.ones(len(indices), dtype=np.int32)
+    return sparse.csr_matrix((data, indices, indptr),
+                             shape=(graph.num_people(), graph.num_movies()))
+
+
+def distances(incidence, source, transpose=None):
+    """
+    Return an array with the degrees of separation between person
+    `source` and every person, or -1 for people not connected to it.
+    Pass the CSR `transpose` of the incidence matrix to reuse it.
+    """
+    people, movies = incidence.shape
+    if transpose is None:
+        transpose = incidence.T.tocsr()
+
+    distance = np.full(people, -1, dtype=np.int32)
+    distance[source] = 0
+    movie_seen = np.zeros(movies, dtype=bool)
+    frontier = np.zeros(people, dtype=np.int32)
+    frontier[source] = 1
+
+    level = 0
+    while True:
+        # People -> movies they starred in, skipping movies already used
+        reached_movies = (transpose @ frontier) > 0
+        reached_movies &= ~movie_seen
+        movie_seen |= reached_movies
+
+        # Movies -> people in them who have no distance yet
+        reached_people = (incidence @ reached_movies.astype(np.int32)) > 0
+        reached_people &= distance < 0
+        if not reached_people.any():
+            break
+
+        level += 1
+        distance[reached_people] = level
+        frontier = reached_people.astype(np.int32)
+
+    return distance
+
+
+def separation_histogram(distance):
+    """
+    Return (histogram, unreachable), where histogram[d] is the number of
+    people `d` degrees away and unreachable the number not connected.
+    """
+    reached = distance[distance >= 0]
+    return np.bincount(reached).tolist(), int(len(distance) - len(reached))
+
+
+def eccentricities(incidence, sources):
+    """
+    Return the largest finite degrees of separation from each source.
+    """
+    transpose = incidence.T.tocsr()
+    return [int(distances(incidence, source, transpose).max()) for source in sources]
+
+
+def components(incidence):
+    """
+    Return (count, labels) labeling every person with the connected
+    component it belongs to. People without movies are components of
+    their own.
+    """
+    people, movies = incidence.shape
+    bipartite = sparse.bmat([[None, incidence], [incidence.T, None]], format="csr")
+    _, labels = csgraph.connected_components(bipartite, directed=False)
+
+    # Renumber the labels of the people side to 0 .. count - 1
+    unique, labels = np.unique(labels[:people], return_inverse=True)
+    return len(unique), labels
+
+
+if __name__ == "__main__":
+    main()
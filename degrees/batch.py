@@ -0,0 +1,118 @@
+"""
+Answer many degrees-of-separation queries at once.
+
+Usage: python batch.py [directory] [pairs] [--workers N]
+
+Every line of `pairs` (or standard input when it is missing or "-") holds a
+source and a target, separated by a tab. Each of them can be an IMDB person
+id or a name. Results are written to standard output as JSON lines, in the
+order they finish.
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import degrees
+
+
+def main():
+    args = sys.argv[1:]
+    workers = os.cpu_count() or 1
+    if "--workers" in args:
+        i = args.index("--workers")
+        try:
+            workers = int(args[i + 1])
+        except (IndexError, ValueError):
+            sys.exit("Usage: python batch.py [directory] [pairs] [--workers N]")
+        del args[i:i + 2]
+    if len(args) > 2:
+        sys.exit("Usage: python batch.py [directory] [pairs] [--workers N]")
+    directory = args[0] if len(args) >= 1 else "large"
+    filename = args[1] if len(args) == 2 else "-"
+
+    if filename == "-":
+        pairs = read_pairs(sys.stdin)
+    else:
+        with open(filename, encoding="utf-8") as f:
+            pairs = read_pairs(f)
+
+    for answer in run_batch(directory, pairs, workers):
+        print(json.dumps(answer), flush=True)
+
+
+def read_pairs(lines):
+    """
+    Return a list of (source, target) pairs from tab separated lines,
+    skipping blank lines.
+    """
+    pairs = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        source, _, target = line.partition("\t")
+        pairs.append((source.strip(), target.strip()))
+    return pairs
+
+
+def run_batch(directory, pairs, workers):
+    """
+    Load `directory` once and yield one answer dictionary per pair,
+    as soon as each of them is ready.
+    """
+    # With fork, workers inherit the graph and name index loaded here and
+    # share their pages. Otherwise each worker maps the same snapshot file.
+    degrees.load_data(directory)
+    degrees.get_name_index()
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        initializer, initargs = None, ()
+    else:
+        context = multiprocessing.get_context()
+        initializer, initargs = degrees.load_data, (directory,)
+
+    if workers <= 1:
+        yield from map(answer_query, pairs)
+        return
+
+    with context.Pool(workers, initializer, initargs) as pool:
+        yield from pool.imap_unordered(answer_query, pairs, chunksize=16)
+
+
+def resolve(value):
+    """
+    Return the person id for an IMDB id or a name, or None.
+    Shared names go to whoever starred in the most movies.
+    """
+    if value in degrees.people:
+        return value
+    return degrees.person_id_for_name(value, policy="most_movies")
+
+
+def answer_query(pair, deadline=None):
+    """
+    Run one query and return its answer as a JSON-ready dictionary.
+    The search gives up at `deadline` (see degrees.shortest_path).
+    """
+    start = time.perf_counter()
+    source_name, target_name = pair
+    answer = {"source": source_name, "target": target_name}
+
+    source = resolve(source_name)
+    target = resolve(target_name)
+    if source is None or target is None:
+        answer["error"] = "person not found"
+    else:
+        path = degrees.shortest_path(source, target, deadline=deadline)
+        answer["degrees"] = None if path is None else len(path)
+        answer["path"] = path
+
+    answer["latency_ms"] = (time.perf_counter() - start) * 1000
+    return answer
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Synthetic data and benchmarks for degrees.
+
+Usage:
+    python benchmark.py generate directory [--credits N] [--seed S]
+    python benchmark.py run directory [--queries N] [--seed S] [--output FILE]
+
+`generate` writes people.csv, movies.csv and stars.csv with power-law
+distributed filmographies and cast sizes, like the IMDB data. `run` times
+load_data, neighbors_for_person and shortest_path on a fixed random set of
+queries and writes the results as JSON (to standard output by default).
+"""
+
+import csv
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+import degrees
+from server import percentile
+
+CREDITS = 100000
+QUERIES = 200
+SEED = 0
+
+# Shape of the generated data
+CREDITS_PER_PERSON = 4
+CREDITS_PER_MOVIE = 5
+EXPONENT = 0.8
+
+SYLLABLES = ["an", "be", "ca", "do", "el", "fi", "ga", "ho", "is", "jo",
+             "ka", "li", "ma", "no", "or", "pu", "ra", "si", "ta", "vi"]
+
+
+def main():
+    usage = ("Usage: python benchmark.py generate directory [--credits N] [--seed S]\n"
+             "       python benchmark.py run directory [--queries N] [--seed S] [--output FILE]")
+    args = sys.argv[1:]
+    options = {"--credits": CREDITS, "--queries": QUERIES, "--seed": SEED, "--output": None}
+    try:
+        for option, default in options.items():
+            if option in args:
+                i = args.index(option)
+                options[option] = args[i + 1] if default is None else int(args[i + 1])
+                del args[i:i + 2]
+    except (IndexError, ValueError):
+        sys.exit(usage)
+    if len(args) != 2 or args[0] not in ("generate", "run"):
+        sys.exit(usage)
+    command, directory = args
+
+    if command == "generate":
+        generate(directory, options["--credits"], options["--seed"])
+        return
+
+    report = run(directory, options["--queries"], options["--seed"])
+    text = json.dumps(report, indent=2)
+    if options["--output"] is None:
+        print(text)
+    else:
+        with open(options["--output"], "w") as f:
+            f.write(text + "\n")
+
+
+def power_law_weights(n, exponent=EXPONENT):
+    """
+    Return cumulative weights where item `i` is picked with
+    probability proportional to (i + 1) ** -exponent.
+    """
+    return list(itertools.accumulate((i + 1) ** -exponent for i in range(n)))
+
+
+def generate(directory, credits=CREDITS, seed=SEED):
+    """
+    Write a synthetic dataset with about `credits` star credits.
+    """
+    rng = random.Random(seed)
+    num_people = max(2, credits // CREDITS_PER_PERSON)
+    num_movies = max(1, credits // CREDITS_PER_MOVIE)
+    os.makedirs(directory, exist_ok=True)
+
+    # Few distinct names, so that some people share theirs
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(num_people):
+            first = "".join(rng.choices(SYLLABLES, k=2)).title()
+            last = "".join(rng.choices(SYLLABLES, k=3)).title()
+            writer.writerow([i + 1, f"{first} {last}", rng.randint(1900, 2010)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(num_movies):
+            title = " ".join(rng.choices(SYLLABLES, k=3)).title()
+            writer.writerow([i + 1, title, rng.randint(1920, 2024)])
+
+    # Popular people and big movies take a much larger share of credits
+    person_weights = power_law_weights(num_people)
+    movie_weights = power_law_weights(num_movies)
+    person_order = list(range(1, num_people + 1))
+    movie_order = list(range(1, num_movies + 1))
+    rng.shuffle(person_order)
+    rng.shuffle(movie_order)
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        done = 0
+        while done < credits:
+            batch = min(100000, credits - done)
+            people = rng.choices(person_order, cum_weights=person_weights, k=batch)
+            movies = rng.choices(movie_order, cum_weights=movie_weights, k=batch)
+            writer.writerows(zip(people, movies))
+            done += batch
+
+
+def summarize(latencies):
+    """
+    Return p50/p99/mean of a list of latencies in seconds, as milliseconds,
+    or None for each of them without any latency.
+    """
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"p50_ms": None, "p99_ms": None, "mean_ms": None}
+    return {
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+    }
+
+
+def reset():
+    """
+    Forget everything load_data loaded, so it can be timed again.
+    """
+    degrees.people = {}
+    degrees.movies = {}
+    degrees.graph = None
+    degrees.name_index = None
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process, in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run(directory, queries=QUERIES, seed=SEED):
+    """
+    Benchmark `directory` and return the results as a dictionary.
+    """
+    report = {
+        "directory": os.path.abspath(directory),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+    }
+
+    # Loading from the CSV files, then from the snapshot they leave behind
+    snapshot = os.path.join(directory, "degrees.snapshot")
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+    start = time.perf_counter()
+    degrees.load_data(directory)
+    report["load_csv_s"] = time.perf_counter() - start
+    report["peak_rss_after_load_mb"] = peak_rss_mb()
+
+    reset()
+    start = time.perf_counter()
+    degrees.load_data(directory)
+    report["load_snapshot_s"] = time.perf_counter() - start
+
+    graph = degrees.graph
+    report["people"] = graph.num_people()
+    report["movies"] = graph.num_movies()
+    report["credits"] = graph.num_credits()
+
+    # The same seed always gives the same query set for the same data
+    rng = random.Random(seed)
+    person_ids = graph.person_ids
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(queries)]
+
+    latencies = []
+    for source, _ in pairs:
+        start = time.perf_counter()
+        degrees.neighbors_for_person(source)
+        latencies.append(time.perf_counter() - start)
+    report["neighbors_for_person"] = summarize(latencies)
+
+    for name, bidirectional in [("shortest_path_bidirectional", True),
+                                ("shortest_path_bfs", False)]:
+        latencies = []
+        expanded = []
+        connected = 0
+        for source, target in pairs:
+            start = time.perf_counter()
+            path = degrees.shortest_path(source, target, bidirectional=bidirectional, cached=False)
+            latencies.append(time.perf_counter() - start)
+            expanded.append(graph.expanded)
+            connected += path is not None
+        result = summarize(latencies)
+        result["nodes_expanded_mean"] = sum(expanded) / len(expanded) if expanded else None
+        result["nodes_expanded_max"] = max(expanded, default=None)
+        result["connected"] = connected
+        report[name] = result
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+if __name__ == "__main__":
+    main()
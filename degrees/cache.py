@@ -0,0 +1,166 @@
+"""
+Least recently used cache of complete breadth-first search trees.
+
+A tree rooted at a person answers every query from (or to) that person with
+a walk along parent pointers, instead of a new search. Trees are only built
+for people that keep coming back, and the cache is bounded by the memory
+its parent arrays take.
+"""
+
+from collections import OrderedDict
+
+from graph import walk_parents
+
+# Default memory budget for cached trees, in bytes
+MAX_BYTES = 256 * 1024 * 1024
+
+# A person must be queried this many times before its tree is built
+PROMOTE_AFTER = 2
+
+# Forget the query counts once this many different people are being counted
+MAX_REQUESTS = 100000
+
+
+class TreeCache():
+
+    def __init__(self, max_bytes=MAX_BYTES, promote_after=PROMOTE_AFTER):
+        """
+        Create an empty cache.
+            - `max_bytes`: memory budget for the parent arrays of all trees
+            - `promote_after`: queries from a person before its tree is built
+        """
+        self.max_bytes = max_bytes
+        self.promote_after = promote_after
+        self.trees = OrderedDict()
+        self.bytes = 0
+
+        # How many times each uncached person has been queried
+        self.requests = {}
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def clear(self):
+        """
+        Drop every cached tree, for example after the graph changes.
+        """
+        self.trees.clear()
+        self.requests.clear()
+        self.bytes = 0
+
+    def discard(self, root):
+        """
+        Drop the tree rooted at `root`, if there is one.
+        """
+        tree = self.trees.pop(root, None)
+        if tree is not None:
+            self.bytes -= tree_size(tree)
+
+    def invalidate(self, people):
+        """
+        Drop every tree that reaches any of the integer person indexes
+        in `people`, since changes around them may shorten or break
+        paths of that tree.
+        """
+        for root, tree in list(self.trees.items()):
+            parent = tree[0]
+            if any(reachable(parent, p) for p in people):
+                self.discard(root)
+                self.invalidations += 1
+
+    def stats(self):
+        """
+        Return the cache counters as a dictionary.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "trees": len(self.trees),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "builds": self.builds,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def lookup(self, graph, source, target, deadline=None):
+        """
+        Try to answer a query between integer person indexes from a cached
+        tree rooted at either end, building the source tree when the
+        source is popular enough (and before `deadline`, see bfs_tree).
+
+        Returns (True, path) on a hit, where path may be None for people
+        that are not connected, and (False, None) on a miss.
+        """
+        if source in self.trees:
+            self.trees.move_to_end(source)
+            self.hits += 1
+            parent, via = self.trees[source]
+            if not reachable(parent, target):
+                return True, None
+            return True, walk_parents(parent, via, source, target)
+
+        if target in self.trees:
+            self.trees.move_to_end(target)
+            self.hits += 1
+            parent, via = self.trees[target]
+            if not reachable(parent, source):
+                return True, None
+
+            # Parent pointers of a tree rooted at the target lead towards it
+            path = []
+            node = source
+            while node != target:
+                path.append((via[node], parent[node]))
+                node = parent[node]
+            return True, path
+
+        self.misses += 1
+        if len(self.requests) >= MAX_REQUESTS:
+            self.requests.clear()
+        self.requests[source] = self.requests.get(source, 0) + 1
+        if self.requests[source] < self.promote_after:
+            return False, None
+
+        # Popular source, cache its whole tree and answer from it
+        del self.requests[source]
+        tree = graph.bfs_tree(source, deadline)
+        self.builds += 1
+        self.add(source, tree)
+        parent, via = tree
+        if parent[target] == -1:
+            return True, None
+        return True, walk_parents(parent, via, source, target)
+
+    def add(self, root, tree):
+        """
+        Store `tree`, evicting least recently used trees to stay in budget.
+        """
+        size = tree_size(tree)
+        if size > self.max_bytes:
+            return
+        self.discard(root)
+        while self.trees and self.bytes + size > self.max_bytes:
+            _, old = self.trees.popitem(last=False)
+            self.bytes -= tree_size(old)
+            self.evictions += 1
+        self.trees[root] = tree
+        self.bytes += size
+
+
+def reachable(parent, p):
+    """
+    Whether person `p` is part of the tree with `parent` pointers.
+    People added after the tree was built are not.
+    """
+    return p < len(parent) and parent[p] != -1
+
+
+def tree_size(tree):
+    parent, via = tree
+    return parent.itemsize * len(parent) + via.itemsize * len(via)
@@ -1,56 +1,106 @@
 import csv
 import sys
-#from tkinter import N
+from array import array
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import GraphIndex, TYPECODE
+from cache import TreeCache
+from nameindex import NameIndex
+from snapshot import load_snapshot, save_snapshot
+from tables import Records, StringTable
 
-# Maps names to a set of corresponding person_ids
-names = {}
-
-# Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
+# Maps person_ids to a dictionary of: name, birth (see tables.Records)
 people = {}
 
-# Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
+# Maps movie_ids to a dictionary of: title, year
 movies = {}
 
+# Compact integer index of who starred in what (see graph.py)
+graph = None
+
+# Breadth-first search trees of frequently queried people (see cache.py)
+trees = TreeCache()
+
+# Sorted index of names for exact, prefix and fuzzy lookups, built on first
+# use unless it came with the snapshot
+name_index = None
 
-def load_data(directory):
+
+def load_data(directory, snapshot=True):
     """
     Load data from CSV files into memory.
+
+    With `snapshot`, a binary copy of the data is written next to the CSV
+    files the first time and memory-mapped on later runs, for as long as
+    the CSV files stay unchanged.
     """
-    # Load people
+    global graph, people, movies, name_index
+    trees.clear()
+    name_index = None
+
+    if snapshot:
+        loaded = load_snapshot(directory)
+        if loaded is not None:
+            graph, people, movies, name_index = loaded
+            return
+
+    # Load people, numbered in order of appearance; a repeated id
+    # replaces the fields of the earlier row
+    person_rows = {}
+    person_ids = StringTable()
+    person_names = StringTable()
+    births = StringTable()
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
+            p = person_rows.setdefault(row["id"], len(person_rows))
+            if p == len(person_ids):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                births.append(row["birth"])
             else:
-                names[row["name"].lower()].add(row["id"])
+                person_names[p] = row["name"]
+                births[p] = row["birth"]
 
     # Load movies
+    movie_rows = {}
+    movie_ids = StringTable()
+    titles = StringTable()
+    years = StringTable()
     with open(f"{directory}/movies.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+            m = movie_rows.setdefault(row["id"], len(movie_rows))
+            if m == len(movie_ids):
+                movie_ids.append(row["id"])
+                titles.append(row["title"])
+                years.append(row["year"])
+            else:
+                titles[m] = row["title"]
+                years[m] = row["year"]
 
-    # Load stars
+    # Load stars as parallel arrays of integer indexes
+    credit_people = array(TYPECODE)
+    credit_movies = array(TYPECODE)
     with open(f"{directory}/stars.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
+                p = person_rows[row["person_id"]]
+                m = movie_rows[row["movie_id"]]
             except KeyError:
-                pass
+                continue
+            credit_people.append(p)
+            credit_movies.append(m)
+
+    del person_rows, movie_rows
+
+    graph = GraphIndex.build(person_ids, movie_ids, credit_people, credit_movies)
+    people = Records(graph.person_index, {"name": person_names, "birth": births})
+    movies = Records(graph.movie_index, {"title": titles, "year": years})
+
+    # The snapshot carries the name index, so later runs don't rebuild it
+    if snapshot:
+        save_snapshot(directory, graph, people, movies, get_name_index())
 
 
 def main():
@@ -85,62 +135,57 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=True, cached=True, deadline=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    By default the search grows from both ends at once; pass
+    `bidirectional=False` for a plain breadth-first search from `source`.
+    With `cached`, queries from popular people are answered from their
+    cached search trees. A search still running at `deadline` (a
+    time.time() value) raises graph.SearchTimeout.
     """
-    start_point = source
-    goal = target
-
-    start_node = Node(state=start_point, parent=None, action=None)
-    frontier = QueueFrontier()
-    frontier.add(start_node)
-
-    # Initialize a set to store the explored nodes
-    explored = set()
-
-    while True:
-
-        # If there are not nodes left in the frontier, then no solution
-        if frontier.empty():
-            raise Exception("no solution")
-
-        # Select a node from the frontier
-        node = frontier.remove()
-        
-        # Add neighbors to frontier
-        for movie, actor in neighbors_for_person(node.state):
-            if not frontier.contains_state(actor) and actor not in explored:
-
-                child = Node(state=actor, parent=node, action=movie)
-        
-                if child.state == goal:
-                    solution = []
-                    solution.append((child.action, child.state))
-                    
-                    while node.parent is not None:
-                        solution.append((node.action, node.state)) 
-                        node = node.parent                            
-                    
-                    solution.reverse()
-                    return solution
-
-                frontier.add(child)
-                explored.add(node.state)
-
-
-def person_id_for_name(name):
+    # The search runs over integer indexes, ids are only used at the edges
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+    hit = False
+    if cached:
+        hit, path = trees.lookup(graph, source, target, deadline)
+    if not hit:
+        if bidirectional:
+            path = graph.bidirectional_path(source, target, deadline)
+        else:
+            path = graph.shortest_path(source, target, deadline)
+    if path is None:
+        return None
+
+    return [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+
+
+def person_id_for_name(name, birth=None, policy="ask"):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If `birth` is given, only people born that year are considered.
+    Remaining ambiguities are resolved according to `policy`:
+        - "ask": prompt for the intended person id
+        - "most_movies": pick the person who starred in the most movies
+        - "none": give up and return None
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = get_name_index().exact(name)
+    if birth is not None:
+        person_ids = [pid for pid in person_ids if people[pid]["birth"] == str(birth)]
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
+        if policy == "most_movies":
+            return max(sorted(person_ids), key=movie_count)
+        elif policy == "none":
+            return None
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
@@ -158,16 +203,34 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def movie_count(person_id):
+    """
+    Returns the number of movies a person starred in.
+    """
+    p = graph.person_index[person_id]
+    return graph.person_offsets[p + 1] - graph.person_offsets[p]
+
+
+def get_name_index():
+    """
+    Returns the index of names, building it the first time.
+    """
+    global name_index
+    if name_index is None:
+        name_index = NameIndex.build(people.columns["name"], graph.person_index.order, graph.person_ids)
+    return name_index
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
+    movie_ids = graph.movie_ids
+    person_ids = graph.person_ids
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for m, p in graph.neighbors(graph.person_index[person_id]):
+        neighbors.add((movie_ids[m], person_ids[p]))
     return neighbors
 
 
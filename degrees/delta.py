@@ -0,0 +1,131 @@
+"""
+Incremental updates of a loaded degrees dataset.
+
+A delta is a directory holding any of these CSV files:
+
+    people.csv, movies.csv, stars.csv      rows to add, same columns as the
+                                           full dataset
+    removed_people.csv, removed_movies.csv ids to remove (column: id)
+    removed_stars.csv                      credits to remove
+                                           (columns: person_id, movie_id)
+
+Removals are applied before additions, so a delta can also replace rows.
+"""
+
+import csv
+import os
+
+import degrees
+
+
+def read_rows(directory, filename):
+    """
+    Return the rows of `filename` in `directory`, or [] if it is missing.
+    """
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def apply_delta(directory):
+    """
+    Apply the delta in `directory` to the data loaded by degrees.load_data
+    without reloading it. Cached search trees affected by the changes are
+    dropped. Returns a dictionary counting what changed.
+    """
+    graph = degrees.graph
+    removed = set()
+    added = []
+    summary = {"people_added": 0, "movies_added": 0, "people_removed": 0,
+               "movies_removed": 0, "credits_added": 0, "credits_removed": 0}
+
+    # Removed people and movies lose all of their credits
+    for row in read_rows(directory, "removed_people.csv"):
+        if row["id"] not in degrees.people:
+            continue
+        p = graph.person_index.pop(row["id"])
+        removed.update((p, m) for m in graph.movies_of(p))
+        summary["people_removed"] += 1
+
+    for row in read_rows(directory, "removed_movies.csv"):
+        if row["id"] not in degrees.movies:
+            continue
+        m = graph.movie_index.pop(row["id"])
+        removed.update((p, m) for p in graph.stars_of(m))
+        summary["movies_removed"] += 1
+
+    for row in read_rows(directory, "removed_stars.csv"):
+        try:
+            removed.add((graph.person_index[row["person_id"]], graph.movie_index[row["movie_id"]]))
+        except KeyError:
+            pass
+
+    # New people and movies are appended to the index, and get their
+    # fields once they are in it
+    new_people = {}
+    for row in read_rows(directory, "people.csv"):
+        person = {
+            "name": row["name"],
+            "birth": row["birth"]
+        }
+        if row["id"] in degrees.people:
+            degrees.people[row["id"]] = person
+        else:
+            new_people[row["id"]] = person
+
+    new_movies = {}
+    for row in read_rows(directory, "movies.csv"):
+        movie = {
+            "title": row["title"],
+            "year": row["year"]
+        }
+        if row["id"] in degrees.movies:
+            degrees.movies[row["id"]] = movie
+        else:
+            new_movies[row["id"]] = movie
+    new_person_ids = list(new_people)
+    new_movie_ids = list(new_movies)
+    summary["people_added"] = len(new_person_ids)
+    summary["movies_added"] = len(new_movie_ids)
+
+    # Credits refer to people and movies by id, including the new ones
+    old_people = graph.num_people()
+    old_movies = graph.num_movies()
+    person_index = {pid: old_people + i for i, pid in enumerate(new_person_ids)}
+    movie_index = {mid: old_movies + i for i, mid in enumerate(new_movie_ids)}
+    for row in read_rows(directory, "stars.csv"):
+        p = person_index.get(row["person_id"], graph.person_index.get(row["person_id"]))
+        m = movie_index.get(row["movie_id"], graph.movie_index.get(row["movie_id"]))
+        if p is not None and m is not None:
+            added.append((p, m))
+
+    # Keep only the credits that really change: a credit both removed and
+    # added again stays, and credits already present are not added twice
+    def present(credit):
+        p, m = credit
+        return p < old_people and m < old_movies and m in graph.movies_of(p)
+
+    added = list(dict.fromkeys(added))
+    readded = set(added)
+    removed = [credit for credit in removed if present(credit) and credit not in readded]
+    added = [credit for credit in added if not present(credit)]
+    summary["credits_added"] = len(added)
+    summary["credits_removed"] = len(removed)
+
+    # Every search tree reaching someone next to a changed credit may change
+    touched = set()
+    for p, m in added + removed:
+        touched.add(p)
+        if m < old_movies:
+            touched.update(graph.stars_of(m))
+    degrees.trees.invalidate(touched)
+
+    graph.apply_changes(new_person_ids, new_movie_ids, added, removed)
+    for person_id in new_person_ids:
+        degrees.people[person_id] = new_people[person_id]
+    for movie_id in new_movie_ids:
+        degrees.movies[movie_id] = new_movies[movie_id]
+    degrees.name_index = None
+    return summary
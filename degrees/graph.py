@@ -0,0 +1,479 @@
+"""
+Compact index of the actor/movie graph.
+
+People and movies are renumbered to consecutive integers and the bipartite
+graph is stored as two CSR (compressed sparse row) structures:
+
+    person_offsets[p] .. person_offsets[p + 1]  -> slice of person_movies
+    movie_offsets[m]  .. movie_offsets[m + 1]   -> slice of movie_people
+
+Every array is a flat `array.array` of machine integers, so the graph costs
+a few bytes per credit instead of a Python set entry per credit. The IMDB
+ids are packed the same way (see tables.py).
+"""
+
+import time
+from array import array
+
+from tables import SortedIndex
+
+# Typecode used for every integer array of the index
+TYPECODE = "i"
+
+# Movies opened between two looks at the clock by a search with a deadline
+DEADLINE_EVERY = 16
+
+# Search generations before the stamp arrays are cleared and reused from 1
+MAX_GENERATION = 2 ** 31 - 1
+
+
+class SearchTimeout(Exception):
+    """
+    Raised by a search that was still running at its deadline.
+    """
+
+
+class SearchState():
+
+    def __init__(self):
+        """
+        Scratch arrays for one direction of a search, reused by every
+        search. A person or movie counts as seen only if its stamp equals
+        the current generation, so starting a search doesn't clear or
+        allocate anything the size of the graph. Searches of one index must
+        therefore not run in several threads at once.
+        """
+        self.generation = 0
+        self.person_stamp = array(TYPECODE)
+        self.parent = array(TYPECODE)
+        self.via = array(TYPECODE)
+        self.movie_stamp = array(TYPECODE)
+
+    def start(self, num_people, num_movies):
+        """
+        Begin a new search over a graph of the given size and return its
+        generation.
+        """
+        # The graph may have grown since the last search
+        for values, size in ((self.person_stamp, num_people), (self.parent, num_people),
+                             (self.via, num_people), (self.movie_stamp, num_movies)):
+            if len(values) < size:
+                values.extend(array(TYPECODE, [0]) * (size - len(values)))
+
+        self.generation += 1
+        if self.generation == MAX_GENERATION:
+            self.person_stamp = array(TYPECODE, [0]) * len(self.person_stamp)
+            self.movie_stamp = array(TYPECODE, [0]) * len(self.movie_stamp)
+            self.generation = 1
+        return self.generation
+
+
+class GraphIndex():
+
+    def __init__(self, person_ids, movie_ids,
+                 person_offsets, person_movies,
+                 movie_offsets, movie_people,
+                 person_order=None, movie_order=None):
+        """
+        Wrap already built CSR arrays.
+            - `person_ids`: StringTable mapping person index -> IMDB person id
+            - `movie_ids`: StringTable mapping movie index -> IMDB movie id
+            - `person_offsets`, `person_movies`: CSR of person -> movies
+            - `movie_offsets`, `movie_people`: CSR of movie -> people
+            - `person_order`, `movie_order`: indexes sorted by their ids,
+              computed when not given (see tables.SortedIndex)
+        """
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+        # Reverse lookups from IMDB ids to integer indexes
+        self.person_index = SortedIndex(person_ids, person_order)
+        self.movie_index = SortedIndex(movie_ids, movie_order)
+
+        # Number of people expanded by the last search
+        self.expanded = 0
+
+        # Reusable scratch arrays of both directions of a search
+        self.searches = [SearchState(), SearchState()]
+
+    @classmethod
+    def build(cls, person_ids, movie_ids, credit_people, credit_movies):
+        """
+        GraphIndex.build(...) builds the CSR arrays from parallel arrays
+        of credits, where credit `k` says that person `credit_people[k]`
+        starred in movie `credit_movies[k]` (both integer indexes).
+        Duplicate credits are kept only once.
+        """
+        # Person -> movies, with duplicated credits removed
+        person_offsets, person_movies = csr(len(person_ids), credit_people, credit_movies)
+        person_offsets, person_movies = unique_rows(person_offsets, person_movies)
+
+        # Movie -> people is the transpose of the person -> movies rows
+        credit_rows = array(TYPECODE)
+        for p in range(len(person_ids)):
+            credit_rows.extend([p] * (person_offsets[p + 1] - person_offsets[p]))
+        movie_offsets, movie_people = csr(len(movie_ids), person_movies, credit_rows)
+
+        return cls(person_ids, movie_ids,
+                   person_offsets, person_movies,
+                   movie_offsets, movie_people)
+
+    def apply_changes(self, new_person_ids, new_movie_ids, added, removed):
+        """
+        Update the index in place.
+            - `new_person_ids`, `new_movie_ids`: ids appended to the index
+            - `added`: (person, movie) integer credits to add
+            - `removed`: (person, movie) integer credits to remove
+
+        Only the rows of people and movies whose credits change are
+        rebuilt; the rest of the arrays is copied over in bulk.
+        """
+        for pid in new_person_ids:
+            self.person_ids.append(pid)
+            self.person_index.add(len(self.person_ids) - 1)
+        for mid in new_movie_ids:
+            self.movie_ids.append(mid)
+            self.movie_index.add(len(self.movie_ids) - 1)
+
+        person_rows = changed_rows(self.person_offsets, self.person_movies,
+                                   added, removed)
+        movie_rows = changed_rows(self.movie_offsets, self.movie_people,
+                                  [(m, p) for p, m in added],
+                                  [(m, p) for p, m in removed])
+        self.person_offsets, self.person_movies = splice(
+            self.person_offsets, self.person_movies, person_rows, self.num_people())
+        self.movie_offsets, self.movie_people = splice(
+            self.movie_offsets, self.movie_people, movie_rows, self.num_movies())
+
+    def num_people(self):
+        return len(self.person_ids)
+
+    def num_movies(self):
+        return len(self.movie_ids)
+
+    def num_credits(self):
+        return len(self.person_movies)
+
+    def movies_of(self, p):
+        """
+        Return the integer indexes of the movies person `p` starred in.
+        """
+        return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+
+    def stars_of(self, m):
+        """
+        Return the integer indexes of the people who starred in movie `m`.
+        """
+        return self.movie_people[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+
+    def neighbors(self, p):
+        """
+        Yield (movie, person) integer pairs for everyone who starred
+        with person `p`, including `p` itself.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+        for k in range(person_offsets[p], person_offsets[p + 1]):
+            m = person_movies[k]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                yield m, movie_people[j]
+
+    def shortest_path(self, source, target, deadline=None):
+        """
+        Breadth-first search between integer person indexes.
+
+        Return the list of (movie, person) integer pairs leading from
+        `source` to `target`, or None if they are not connected. Raises
+        SearchTimeout if still searching at `deadline` (a time.time() value).
+        """
+        self.expanded = 0
+        if source == target:
+            return []
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        # parent[p] is the person we reached `p` from, via movie via[p],
+        # for every person stamped with this search's generation
+        search = self.searches[0]
+        generation = search.start(self.num_people(), self.num_movies())
+        person_stamp, parent, via = search.person_stamp, search.parent, search.via
+        person_stamp[source] = generation
+        parent[source] = source
+
+        # Each movie only needs to be expanded once
+        movie_stamp = search.movie_stamp
+
+        # Level by level expansion, using plain lists as the frontier
+        frontier = [source]
+        opened = 0
+        while frontier:
+            next_frontier = []
+            for p in frontier:
+                self.expanded += 1
+                for k in range(person_offsets[p], person_offsets[p + 1]):
+                    m = person_movies[k]
+                    if movie_stamp[m] == generation:
+                        continue
+                    movie_stamp[m] = generation
+                    opened += 1
+                    check_deadline(deadline, opened)
+                    for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                        q = movie_people[j]
+                        if person_stamp[q] == generation:
+                            continue
+                        person_stamp[q] = generation
+                        parent[q] = p
+                        via[q] = m
+                        if q == target:
+                            return walk_parents(parent, via, source, target)
+                        next_frontier.append(q)
+            frontier = next_frontier
+
+        return None
+
+    def bidirectional_path(self, source, target, deadline=None):
+        """
+        Breadth-first search growing from both `source` and `target`,
+        always expanding whichever frontier is smaller.
+
+        Returns the same kind of path as `shortest_path`, of the same
+        length, or None if the two people are not connected. Raises
+        SearchTimeout if still searching at `deadline`.
+        """
+        self.expanded = 0
+        if source == target:
+            return []
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        # One set of parent pointers and seen movies for each direction
+        generations = [search.start(self.num_people(), self.num_movies())
+                       for search in self.searches]
+        person_stamps = [search.person_stamp for search in self.searches]
+        parents = [search.parent for search in self.searches]
+        vias = [search.via for search in self.searches]
+        movie_stamps = [search.movie_stamp for search in self.searches]
+        frontiers = [[source], [target]]
+        opened = 0
+        for side, p in enumerate((source, target)):
+            person_stamps[side][p] = generations[side]
+            parents[side][p] = p
+
+        while frontiers[0] and frontiers[1]:
+
+            # Grow the side with fewer people waiting to be expanded
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            generation = generations[side]
+            person_stamp, parent, via = person_stamps[side], parents[side], vias[side]
+            movie_stamp = movie_stamps[side]
+            other_generation = generations[1 - side]
+            other_stamp = person_stamps[1 - side]
+
+            next_frontier = []
+            for p in frontiers[side]:
+                self.expanded += 1
+                for k in range(person_offsets[p], person_offsets[p + 1]):
+                    m = person_movies[k]
+                    if movie_stamp[m] == generation:
+                        continue
+                    movie_stamp[m] = generation
+                    opened += 1
+                    check_deadline(deadline, opened)
+                    for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                        q = movie_people[j]
+                        if person_stamp[q] == generation:
+                            continue
+                        person_stamp[q] = generation
+                        parent[q] = p
+                        via[q] = m
+
+                        # Levels are expanded whole, so the first meeting
+                        # point already lies on a shortest path
+                        if other_stamp[q] == other_generation:
+                            return join_paths(parents, vias, source, target, q)
+                        next_frontier.append(q)
+            frontiers[side] = next_frontier
+
+        return None
+
+    def bfs_tree(self, source, deadline=None):
+        """
+        Breadth-first search from `source` over the whole graph.
+
+        Returns (parent, via) arrays where parent[p] is the person `p`
+        was reached from and via[p] the movie they share, or -1 for people
+        not connected to `source`. parent[source] is `source` itself.
+        Raises SearchTimeout if still searching at `deadline`.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        parent = array(TYPECODE, [-1]) * self.num_people()
+        via = array(TYPECODE, [-1]) * self.num_people()
+        parent[source] = source
+        movie_seen = bytearray(self.num_movies())
+
+        self.expanded = 0
+        frontier = [source]
+        opened = 0
+        while frontier:
+            next_frontier = []
+            for p in frontier:
+                self.expanded += 1
+                for k in range(person_offsets[p], person_offsets[p + 1]):
+                    m = person_movies[k]
+                    if movie_seen[m]:
+                        continue
+                    movie_seen[m] = 1
+                    opened += 1
+                    check_deadline(deadline, opened)
+                    for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                        q = movie_people[j]
+                        if parent[q] == -1:
+                            parent[q] = p
+                            via[q] = m
+                            next_frontier.append(q)
+            frontier = next_frontier
+
+        return parent, via
+
+
+def check_deadline(deadline, count):
+    """
+    Raise SearchTimeout if `deadline` has passed, looking at the clock
+    only once every DEADLINE_EVERY calls (counted by `count`).
+    """
+    if deadline is not None and count % DEADLINE_EVERY == 0 and time.time() > deadline:
+        raise SearchTimeout
+
+
+def csr(size, rows, cols):
+    """
+    Build (offsets, values) CSR arrays with `size` rows from
+    parallel arrays of row and column indexes, using a counting sort.
+    """
+    # Count how many entries every row has
+    offsets = array(TYPECODE, [0]) * (size + 1)
+    for r in rows:
+        offsets[r + 1] += 1
+
+    # Prefix sum turns the counts into starting offsets
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    # Place every column into the next free slot of its row
+    values = array(TYPECODE, [0]) * len(rows)
+    cursor = array(TYPECODE, offsets)
+    for r, c in zip(rows, cols):
+        values[cursor[r]] = c
+        cursor[r] += 1
+
+    return offsets, values
+
+
+def unique_rows(offsets, values):
+    """
+    Return new (offsets, values) CSR arrays where every row keeps
+    only the first occurrence of each value.
+    """
+    new_offsets = array(TYPECODE, [0]) * len(offsets)
+    new_values = array(TYPECODE)
+    for r in range(len(offsets) - 1):
+        row = values[offsets[r]:offsets[r + 1]]
+        if len(set(row)) == len(row):
+            new_values.extend(row)
+        else:
+            new_values.extend(dict.fromkeys(row))
+        new_offsets[r + 1] = len(new_values)
+    return new_offsets, new_values
+
+
+def changed_rows(offsets, values, added, removed):
+    """
+    Return {row: new values} for every row touched by the (row, value)
+    pairs in `added` and `removed`.
+    """
+    rows = {}
+    for r, _ in list(removed) + list(added):
+        if r not in rows:
+            rows[r] = list(values[offsets[r]:offsets[r + 1]]) if r < len(offsets) - 1 else []
+    for r, v in removed:
+        if v in rows[r]:
+            rows[r].remove(v)
+    for r, v in added:
+        if v not in rows[r]:
+            rows[r].append(v)
+    return rows
+
+
+def splice(offsets, values, rows, size):
+    """
+    Return new (offsets, values) CSR arrays with `size` rows, where the
+    rows in `rows` are replaced and all other rows are kept as they are.
+    Rows past the end of the old arrays start out empty.
+    """
+    old_size = len(offsets) - 1
+    new_offsets = array(TYPECODE, [0])
+    new_values = array(TYPECODE)
+
+    def copy(start, end):
+        # Unchanged old rows are copied in bulk, with shifted offsets
+        stop = min(end, old_size)
+        if start < stop:
+            shift = len(new_values) - offsets[start]
+            new_values.frombytes(memoryview(values[offsets[start]:offsets[stop]]).cast("B"))
+            new_offsets.extend(o + shift for o in offsets[start + 1:stop + 1])
+        new_offsets.extend([len(new_values)] * (end - max(start, stop)))
+
+    start = 0
+    for r in sorted(rows):
+        copy(start, r)
+        new_values.extend(rows[r])
+        new_offsets.append(len(new_values))
+        start = r + 1
+    copy(start, size)
+
+    return new_offsets, new_values
+
+
+def walk_parents(parent, via, source, target):
+    """
+    Follow parent pointers back from `target` to `source` and return
+    the (movie, person) integer pairs in order from source to target.
+    """
+    path = []
+    node = target
+    while node != source:
+        path.append((via[node], node))
+        node = parent[node]
+    path.reverse()
+    return path
+
+
+def join_paths(parents, vias, source, target, meet):
+    """
+    Join the forward half (source -> meet) and backward half
+    (meet -> target) of a bidirectional search into one path.
+    """
+    path = walk_parents(parents[0], vias[0], source, meet)
+
+    # Backward pointers lead towards the target, so reuse them in reverse
+    node = meet
+    while node != target:
+        path.append((vias[1][node], parents[1][node]))
+        node = parents[1][node]
+    return path
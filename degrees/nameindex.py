@@ -0,0 +1,234 @@
+"""
+Sorted index of people's names.
+
+Names are lowercased and kept in one sorted table of strings, with the
+people carrying each name stored CSR style in an integer array. Exact and
+prefix lookups are binary searches.
+
+Edit distance lookups use a deletion index, as in SymSpell. The names are
+split into groups sharing their first PREFIX characters, and every group
+is stored under each string left after deleting up to MAX_DISTANCE
+characters from that prefix (as a crc32, in a sorted array). Two names
+within k edits of each other have prefixes that become equal after at most
+k deletions from each, so a query finds every group that can hold a match
+by looking up its own deletions. Only those groups are walked like a trie:
+consecutive names share their prefix rows of the Levenshtein table, only
+the cells within k of the diagonal are computed, and a prefix that is
+already too far from the query skips every name below it.
+"""
+
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+
+from graph import TYPECODE, check_deadline
+from tables import StringTable
+
+# Sorts after every character that can follow a prefix
+HIGHEST_CHARACTER = chr(0x10FFFF)
+
+# Characters of a name that decide its group in the deletion index
+PREFIX = 8
+
+# Largest distance answered from the deletion index; further lookups walk
+# every name
+MAX_DISTANCE = 2
+
+# Typecode of the crc32 of a deletion
+HASH_TYPECODE = "I"
+
+
+class NameIndex():
+
+    def __init__(self, person_ids, keys, offsets, people, starts, variants, groups):
+        """
+        Wrap already built arrays.
+            - `person_ids`: maps integer indexes back to person ids
+            - `keys`: StringTable of the lowercase names, sorted
+            - `offsets`, `people`: CSR of name -> integer person indexes
+            - `starts`: first name of every group, plus the end of the last
+            - `variants`, `groups`: sorted crc32 of the deletions of each
+              group's prefix, and the group each of them belongs to
+        """
+        self.person_ids = person_ids
+        self.keys = keys
+        self.offsets = offsets
+        self.people = people
+        self.starts = starts
+        self.variants = variants
+        self.groups = groups
+
+    @classmethod
+    def build(cls, names, people, person_ids):
+        """
+        NameIndex.build(...) indexes the names of the integer indexes in
+        `people`, where `names` maps integer indexes to names.
+        """
+        keys = StringTable()
+        offsets = array(TYPECODE)
+        indexes = array(TYPECODE)
+        previous = None
+        for key, p in sorted((names[p].lower(), p) for p in people):
+            if key != previous:
+                keys.append(key)
+                offsets.append(len(indexes))
+                previous = key
+            indexes.append(p)
+        offsets.append(len(indexes))
+
+        # Names sharing their prefix are next to each other once sorted.
+        # Entries (hash << 32 | group) are spread over buckets by the top
+        # byte of their hash, so only one bucket at a time becomes a list
+        # of Python ints to sort.
+        starts = array(TYPECODE)
+        buckets = [array("Q") for _ in range(256)]
+        previous = None
+        for i, key in enumerate(keys):
+            if key[:PREFIX] != previous:
+                previous = key[:PREFIX]
+                for variant in deletions(previous, MAX_DISTANCE):
+                    h = signature(variant)
+                    buckets[h >> 24].append(h << 32 | len(starts))
+                starts.append(i)
+        starts.append(len(keys))
+
+        variants = array(HASH_TYPECODE)
+        groups = array(TYPECODE)
+        for b, bucket in enumerate(buckets):
+            for entry in sorted(bucket):
+                variants.append(entry >> 32)
+                groups.append(entry & 0xFFFFFFFF)
+            buckets[b] = None
+        return cls(person_ids, keys, offsets, indexes, starts, variants, groups)
+
+    def ids_at(self, i):
+        """
+        Return the person ids carrying the `i`th name of the index.
+        """
+        return [self.person_ids[p] for p in self.people[self.offsets[i]:self.offsets[i + 1]]]
+
+    def exact(self, name):
+        """
+        Return the ids of the people called `name`.
+        """
+        name = name.lower()
+        i = bisect_left(self.keys, name)
+        if i < len(self.keys) and self.keys[i] == name:
+            return self.ids_at(i)
+        return []
+
+    def prefix(self, prefix, limit=None):
+        """
+        Return (name, ids) pairs for names starting with `prefix`,
+        in alphabetical order, at most `limit` of them.
+        """
+        prefix = prefix.lower()
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + HIGHEST_CHARACTER)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [(self.keys[i], self.ids_at(i)) for i in range(start, end)]
+
+    def fuzzy(self, name, max_distance, deadline=None):
+        """
+        Return (distance, name, ids) for names within `max_distance`
+        edits (insertions, deletions, substitutions) of `name`,
+        closest first. Raises SearchTimeout if still searching at `deadline`.
+        """
+        query = name.lower()
+        if max_distance > MAX_DISTANCE:
+            ranges = [(0, len(self.keys))]
+        else:
+            found = set()
+            for variant in deletions(query[:PREFIX], max_distance):
+                h = signature(variant)
+                low = bisect_left(self.variants, h)
+                found.update(self.groups[low:bisect_right(self.variants, h, low)])
+            ranges = [(self.starts[g], self.starts[g + 1]) for g in sorted(found)]
+
+        matches = self.walk(query, max_distance, ranges, deadline)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def walk(self, query, max_distance, ranges, deadline=None):
+        """
+        Return (distance, name, ids) for the names within `max_distance`
+        edits of `query` among the ranges of names (start, end), which
+        must be sorted and not overlap.
+        """
+        keys = self.keys
+        matches = []
+
+        # rows[d] is the Levenshtein row of the query against previous[:d]
+        rows = [[j if j <= max_distance else max_distance + 1 for j in range(len(query) + 1)]]
+        previous = ""
+
+        steps = 0
+        for start, end in ranges:
+            i = start
+            while i < end:
+                key = keys[i]
+                steps += 1
+                check_deadline(deadline, steps)
+
+                # Reuse the rows of the prefix shared with the previous name
+                common = 0
+                limit = min(len(previous), len(key), len(rows) - 1)
+                while common < limit and previous[common] == key[common]:
+                    common += 1
+                del rows[common + 1:]
+
+                skipped = False
+                for depth in range(common, len(key)):
+                    row = next_row(rows[-1], depth + 1, key[depth], query, max_distance)
+                    rows.append(row)
+                    if min(row) > max_distance:
+                        # No name with this prefix can get close enough
+                        i = bisect_left(keys, key[:depth + 1] + HIGHEST_CHARACTER, i, end)
+                        skipped = True
+                        break
+
+                previous = key[:len(rows) - 1]
+                if not skipped:
+                    if rows[-1][-1] <= max_distance:
+                        matches.append((rows[-1][-1], key, self.ids_at(i)))
+                    i += 1
+
+        return matches
+
+
+def deletions(string, count):
+    """
+    Return the set of strings left after deleting up to `count`
+    characters from `string`, including `string` itself.
+    """
+    found = {string}
+    layer = {string}
+    for _ in range(count):
+        layer = {s[:i] + s[i + 1:] for s in layer for i in range(len(s))}
+        found |= layer
+    return found
+
+
+def signature(string):
+    """
+    Return the crc32 a deletion is stored under.
+    """
+    return zlib.crc32(string.encode("utf-8"))
+
+
+def next_row(row, depth, character, query, max_distance):
+    """
+    Return the Levenshtein row that follows `row` after appending
+    `character` to the indexed name, now `depth` characters long. Cells
+    further than `max_distance` from the diagonal can't lead to a match,
+    so they are not computed and hold max_distance + 1.
+    """
+    far = max_distance + 1
+    new_row = [far] * len(row)
+    if depth <= max_distance:
+        new_row[0] = depth
+    for j in range(max(1, depth - max_distance), min(len(query), depth + max_distance) + 1):
+        cost = 0 if query[j - 1] == character else 1
+        new_row[j] = min(new_row[j - 1] + 1, row[j] + 1, row[j - 1] + cost, far)
+    return new_row
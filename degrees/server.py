@@ -0,0 +1,261 @@
+"""
+Resident degrees query server on a localhost HTTP endpoint.
+
+Usage: python server.py [directory] [--port N] [--workers N] [--timeout SECONDS]
+
+The data is loaded once and queries run on a pool of worker processes that
+share it. Endpoints (all GET, all answering JSON):
+
+    /path?source=...&target=...       degrees of separation between two people
+    /person?name=...[&prefix=1][&distance=K]
+                                      people matching a name exactly, by
+                                      prefix, or within K edits
+    /stats                            query counts and latency percentiles
+"""
+
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+from batch import answer_query
+from graph import SearchTimeout, check_deadline
+
+PORT = 8050
+WORKERS = 4
+
+# Seconds a query may take before the client gets a timeout error
+TIMEOUT = 10.0
+
+# Extra seconds to wait for a worker that is past the deadline but has
+# not noticed yet
+GRACE = 1.0
+
+# Most matches returned by a name lookup
+MAX_MATCHES = 50
+
+# Latencies kept per endpoint for the percentiles of /stats
+LATENCY_WINDOW = 10000
+
+# Endpoints counted in /stats under their own path; requests for any other
+# path are counted together, so unknown paths can't grow the counters
+ENDPOINTS = ["/path", "/person"]
+OTHER = "other"
+
+
+def main():
+    args = sys.argv[1:]
+    options = {"--port": PORT, "--workers": WORKERS, "--timeout": TIMEOUT}
+    try:
+        for option, default in options.items():
+            if option in args:
+                i = args.index(option)
+                options[option] = type(default)(args[i + 1])
+                del args[i:i + 2]
+    except (IndexError, ValueError):
+        sys.exit("Usage: python server.py [directory] [--port N] [--workers N] [--timeout SECONDS]")
+    if len(args) > 1:
+        sys.exit("Usage: python server.py [directory] [--port N] [--workers N] [--timeout SECONDS]")
+    directory = args[0] if args else "large"
+
+    print("Loading data...")
+    server = create_server(directory, options["--port"], options["--workers"], options["--timeout"])
+    print(f"Serving on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown_pool()
+        server.server_close()
+
+
+class Stats():
+
+    def __init__(self):
+        """
+        Per endpoint counters and a window of recent latencies.
+        """
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.errors = {}
+        self.timeouts = 0
+        self.latencies = {}
+
+    def record(self, endpoint, seconds, error=False):
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            if error:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            if endpoint not in self.latencies:
+                self.latencies[endpoint] = deque(maxlen=LATENCY_WINDOW)
+            self.latencies[endpoint].append(seconds * 1000)
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def summary(self):
+        """
+        Return counts and p50/p90/p99 latencies in milliseconds.
+        """
+        with self.lock:
+            endpoints = {}
+            for endpoint, count in self.counts.items():
+                latencies = sorted(self.latencies[endpoint])
+                endpoints[endpoint] = {
+                    "count": count,
+                    "errors": self.errors.get(endpoint, 0),
+                    "p50_ms": percentile(latencies, 50),
+                    "p90_ms": percentile(latencies, 90),
+                    "p99_ms": percentile(latencies, 99),
+                }
+            return {"endpoints": endpoints, "timeouts": self.timeouts}
+
+
+def percentile(ordered, p):
+    """
+    Nearest-rank percentile of an already sorted list, or None if empty.
+    """
+    if not ordered:
+        return None
+    rank = max(0, -(-len(ordered) * p // 100) - 1)
+    return ordered[int(rank)]
+
+
+class QueryServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address, pool, timeout):
+        super().__init__(address, QueryHandler)
+        self.pool = pool
+        self.query_timeout = timeout
+        self.stats = Stats()
+
+    def shutdown_pool(self):
+        self.pool.terminate()
+        self.pool.join()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        start = time.perf_counter()
+
+        if url.path == "/stats":
+            status, body = 200, self.server.stats.summary()
+        elif url.path == "/path":
+            if "source" not in query or "target" not in query:
+                status, body = 400, {"error": "source and target are required"}
+            else:
+                status, body = self.run(answer_query, ((query["source"], query["target"]),))
+        elif url.path == "/person":
+            if "name" not in query:
+                status, body = 400, {"error": "name is required"}
+            else:
+                try:
+                    distance = int(query.get("distance", 0))
+                except ValueError:
+                    distance = -1
+                if distance < 0:
+                    status, body = 400, {"error": "distance must be a non-negative integer"}
+                else:
+                    prefix = query.get("prefix", "0") not in ("", "0", "false")
+                    status, body = self.run(lookup_name, (query["name"], prefix, distance))
+        else:
+            status, body = 404, {"error": "not found"}
+
+        if url.path != "/stats":
+            endpoint = url.path if url.path in ENDPOINTS else OTHER
+            self.server.stats.record(endpoint, time.perf_counter() - start, error=status != 200)
+        self.send_json(status, body)
+
+    def run(self, function, args):
+        """
+        Run `function(*args)` on the worker pool, within the timeout.
+
+        The deadline travels with the query, so the worker itself stops
+        searching once it passes, and a query that waited in the queue
+        past it is dropped without being started.
+        """
+        deadline = time.time() + self.server.query_timeout
+        pending = self.server.pool.apply_async(run_query, (function, args, deadline))
+        try:
+            return 200, pending.get(self.server.query_timeout + GRACE)
+        except (SearchTimeout, multiprocessing.TimeoutError):
+            self.server.stats.record_timeout()
+            return 504, {"error": "query timed out"}
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_query(function, args, deadline):
+    """
+    Worker side of a query: run `function(*args, deadline=deadline)`
+    unless the deadline already passed while the query was queued.
+    """
+    check_deadline(deadline, 0)
+    return function(*args, deadline=deadline)
+
+
+def lookup_name(name, prefix=False, distance=0, deadline=None):
+    """
+    Return people whose names match `name` as a JSON-ready dictionary.
+    A fuzzy lookup gives up at `deadline`.
+    """
+    index = degrees.get_name_index()
+    if prefix:
+        found = [(0, key, ids) for key, ids in index.prefix(name, MAX_MATCHES)]
+    elif distance > 0:
+        found = index.fuzzy(name, distance, deadline)[:MAX_MATCHES]
+    else:
+        found = [(0, name.lower(), index.exact(name))]
+
+    matches = []
+    for edits, _, ids in found:
+        for person_id in ids:
+            person = degrees.people[person_id]
+            matches.append({
+                "id": person_id,
+                "name": person["name"],
+                "birth": person["birth"],
+                "movies": degrees.movie_count(person_id),
+                "distance": edits,
+            })
+    return {"name": name, "matches": matches}
+
+
+def create_server(directory, port=PORT, workers=WORKERS, timeout=TIMEOUT):
+    """
+    Load `directory`, start the worker pool and return a server bound to
+    127.0.0.1:`port` (0 picks a free port). Call serve_forever() on it.
+    """
+    # Everything the workers need is built before they are forked
+    degrees.load_data(directory)
+    degrees.get_name_index()
+    if "fork" in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context("fork").Pool(workers)
+    else:
+        pool = multiprocessing.Pool(workers, degrees.load_data, (directory,))
+    return QueryServer(("127.0.0.1", port), pool, timeout)
+
+
+if __name__ == "__main__":
+    main()
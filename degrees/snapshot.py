@@ -0,0 +1,164 @@
+"""
+Binary snapshot of a loaded degrees dataset.
+
+The file starts with a small header, followed by every array of the
+loaded data laid out back to back: the integer arrays of the GraphIndex,
+the id orders of its SortedIndexes, the offsets and bytes of every
+StringTable (ids, names, births, titles, years), and the arrays of the
+NameIndex. Loading maps the file into
+memory and wraps the arrays in memoryviews, so nothing is copied or
+parsed, and several processes reading the same snapshot share one copy of
+the data in the page cache.
+
+    MAGIC | version | header length | header JSON | arrays...
+"""
+
+import json
+import mmap
+import os
+import struct
+
+from graph import GraphIndex, TYPECODE
+from nameindex import NameIndex
+from tables import Records, StringTable
+
+MAGIC = b"DEGREES\0"
+
+# Bump whenever the layout of the file changes
+VERSION = 5
+
+# Name of the snapshot file written next to the CSV files
+FILENAME = "degrees.snapshot"
+
+# CSV files whose modification times decide if a snapshot is still valid
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Arrays of the GraphIndex stored in the snapshot, in file order
+ARRAYS = ["person_offsets", "person_movies", "movie_offsets", "movie_people"]
+
+# String tables stored in the snapshot, in file order
+TABLES = ["person_ids", "movie_ids", "names", "births", "titles", "years"]
+
+# Arrays of the NameIndex stored in the snapshot, after its table of names
+NAME_ARRAYS = ["offsets", "people", "starts", "variants", "groups"]
+
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def source_stamps(directory):
+    """
+    Return {filename: [mtime_ns, size]} for the CSV files of `directory`,
+    as lists so they compare equal to the ones read back from JSON.
+    """
+    stamps = {}
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        stamps[filename] = [stat.st_mtime_ns, stat.st_size]
+    return stamps
+
+
+def save_snapshot(directory, graph, people, movies, name_index):
+    """
+    Write a snapshot of the loaded data for `directory`.
+    Returns False if the snapshot could not be written.
+    """
+    path = snapshot_path(directory)
+    segments = [(name, getattr(graph, name)) for name in ARRAYS]
+    segments.append(("person_order", graph.person_index.order))
+    segments.append(("movie_order", graph.movie_index.order))
+    tables = [graph.person_ids, graph.movie_ids,
+              people.columns["name"], people.columns["birth"],
+              movies.columns["title"], movies.columns["year"]]
+    for name, table in zip(TABLES, tables):
+        data, offsets = table.packed()
+        segments.append((f"{name}_offsets", offsets))
+        segments.append((name, data))
+    data, offsets = name_index.keys.packed()
+    segments.append(("name_keys_offsets", offsets))
+    segments.append(("name_keys", data))
+    segments.extend((f"name_{name}", getattr(name_index, name)) for name in NAME_ARRAYS)
+
+    # Every array is described by its name, typecode and length
+    views = [(name, memoryview(values)) for name, values in segments]
+    header = json.dumps({
+        "sources": source_stamps(directory),
+        "typecode": TYPECODE,
+        "arrays": [[name, view.format, len(view)] for name, view in views],
+    }).encode("utf-8")
+
+    # Write to a temporary file first, so readers never see half a snapshot
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            for _, view in views:
+                pad(f)
+                f.write(view)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        return False
+
+    return True
+
+
+def load_snapshot(directory):
+    """
+    Map the snapshot of `directory` into memory.
+
+    Returns (graph, people, movies, name_index), or None if there is no snapshot, it
+    has another version, or the CSV files changed since.
+    """
+    path = snapshot_path(directory)
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic, version, header_length = PREAMBLE.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            return None
+        position = PREAMBLE.size
+        header = json.loads(buffer[position:position + header_length])
+        position += header_length
+        if header["typecode"] != TYPECODE or header["sources"] != source_stamps(directory):
+            return None
+    except (OSError, struct.error, ValueError, KeyError, TypeError):
+        return None
+
+    # Every array is used in place, straight from the mapped file
+    view = memoryview(buffer)
+    arrays = {}
+    for name, typecode, length in header["arrays"]:
+        position += -position % ALIGNMENT
+        end = position + length * struct.calcsize(typecode)
+        arrays[name] = view[position:end].cast(typecode)
+        position = end
+
+    def table(name):
+        return StringTable(arrays[name], arrays[f"{name}_offsets"])
+
+    graph = GraphIndex(table("person_ids"), table("movie_ids"),
+                       *(arrays[name] for name in ARRAYS),
+                       arrays["person_order"], arrays["movie_order"])
+    people = Records(graph.person_index, {"name": table("names"), "birth": table("births")})
+    movies = Records(graph.movie_index, {"title": table("titles"), "year": table("years")})
+    name_index = NameIndex(graph.person_ids, table("name_keys"),
+                           *(arrays[f"name_{name}"] for name in NAME_ARRAYS))
+    return graph, people, movies, name_index
+
+
+def pad(f):
+    """
+    Pad the file with zeros up to the next multiple of ALIGNMENT.
+    """
+    f.write(b"\0" * (-f.tell() % ALIGNMENT))
@@ -0,0 +1,234 @@
+"""
+Compact tables of strings.
+
+A StringTable packs many strings into one UTF-8 byte buffer, with an array
+of offsets marking where each one starts, so a million short strings cost
+their bytes plus 4 bytes each instead of a Python object each. A
+SortedIndex finds the row of a string by binary search over the rows
+sorted by their bytes, and Records puts the two together into the mapping
+from ids to dictionaries of fields that degrees.people and degrees.movies
+have always been.
+
+The buffers can be memoryviews of a mapped snapshot (see snapshot.py);
+they are copied the first time the table is changed.
+"""
+
+from array import array
+
+# Typecode of the offsets into the bytes of a StringTable, which limits
+# a table to 2 GiB of text
+OFFSET_TYPECODE = "i"
+
+# Typecode of the sorted rows of a SortedIndex
+ROW_TYPECODE = "i"
+
+
+class StringTable():
+
+    def __init__(self, data=None, offsets=None):
+        """
+        Wrap the UTF-8 `data` of the strings and their `offsets`: string
+        `i` is data[offsets[i]:offsets[i + 1]]. Empty by default.
+        """
+        self.data = bytearray() if data is None else data
+        self.offsets = array(OFFSET_TYPECODE, [0]) if offsets is None else offsets
+
+        # Strings changed to one of another length, which can't be
+        # written over the old one
+        self.changed = {}
+
+    @classmethod
+    def from_strings(cls, strings):
+        table = cls()
+        for string in strings:
+            table.append(string)
+        return table
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if self.changed and i in self.changed:
+            return self.changed[i]
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __setitem__(self, i, string):
+        encoded = string.encode("utf-8")
+        start = self.offsets[i]
+        end = self.offsets[i + 1]
+        self.changed.pop(i, None)
+        if len(encoded) == end - start:
+            self.make_writable()
+            self.data[start:end] = encoded
+        else:
+            self.changed[i] = string
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def raw(self, i):
+        """
+        Return string `i` as UTF-8 bytes, which sort like the strings.
+        """
+        if self.changed and i in self.changed:
+            return self.changed[i].encode("utf-8")
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+    def append(self, string):
+        self.make_writable()
+        self.data += string.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def packed(self):
+        """
+        Return (data, offsets) with every changed string in place.
+        """
+        if not self.changed:
+            return self.data, self.offsets
+        table = StringTable.from_strings(self)
+        return table.data, table.offsets
+
+    def make_writable(self):
+        """
+        Copy buffers mapped from a snapshot into ones that can change.
+        """
+        if not isinstance(self.data, bytearray):
+            self.data = bytearray(self.data)
+            self.offsets = array(OFFSET_TYPECODE, self.offsets)
+
+
+class SortedIndex():
+
+    def __init__(self, keys, order=None):
+        """
+        Index the rows of StringTable `keys` by their strings, which
+        must be unique. `order` lists the rows sorted by their strings,
+        and is computed when not given.
+        """
+        self.keys = keys
+        if order is None:
+            order = array(ROW_TYPECODE, sorted(range(len(keys)), key=keys.raw))
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        row = self.get(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __iter__(self):
+        for row in self.order:
+            yield self.keys[row]
+
+    def position(self, encoded):
+        """
+        Return where the UTF-8 key `encoded` is, or would be, in `order`.
+        """
+        order = self.order
+        low = 0
+        high = len(order)
+        if self.keys.changed:
+            raw = self.keys.raw
+            while low < high:
+                middle = (low + high) // 2
+                if raw(order[middle]) < encoded:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+        # Nothing was changed, so every key can be read straight from the buffer
+        data = self.keys.data
+        offsets = self.keys.offsets
+        while low < high:
+            middle = (low + high) // 2
+            row = order[middle]
+            if bytes(data[offsets[row]:offsets[row + 1]]) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get(self, key, default=None):
+        """
+        Return the row of `key`, or `default` if it isn't indexed.
+        """
+        encoded = key.encode("utf-8")
+        i = self.position(encoded)
+        if i < len(self.order) and self.keys.raw(self.order[i]) == encoded:
+            return self.order[i]
+        return default
+
+    def add(self, row):
+        """
+        Index row `row` of the keys, usually one just appended.
+        """
+        self.make_writable()
+        self.order.insert(self.position(self.keys.raw(row)), row)
+
+    def pop(self, key):
+        """
+        Stop indexing `key` and return its row. The row itself stays in
+        the table, so the rows after it keep their numbers.
+        """
+        encoded = key.encode("utf-8")
+        i = self.position(encoded)
+        if i == len(self.order) or self.keys.raw(self.order[i]) != encoded:
+            raise KeyError(key)
+        self.make_writable()
+        row = self.order[i]
+        del self.order[i]
+        return row
+
+    def make_writable(self):
+        if not isinstance(self.order, array):
+            self.order = array(ROW_TYPECODE, self.order)
+
+
+class Records():
+
+    def __init__(self, index, columns):
+        """
+        Map the ids of SortedIndex `index` to dictionaries of the strings
+        in their row of `columns`, a dictionary of field names to
+        StringTables.
+        """
+        self.index = index
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __getitem__(self, key):
+        row = self.index[key]
+        return {field: column[row] for field, column in self.columns.items()}
+
+    def __setitem__(self, key, record):
+        """
+        Change the fields of `key`, or fill them in for the row that was
+        just added to the index.
+        """
+        row = self.index[key]
+        for field, column in self.columns.items():
+            if row == len(column):
+                column.append(record[field])
+            else:
+                column[row] = record[field]
+
+    def get(self, key, default=None):
+        return self[key] if key in self.index else default
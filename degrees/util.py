@@ -1,3 +1,16 @@
+"""
+Search nodes and frontiers from the original project.
+
+degrees.py no longer uses them: its searches run over the integer arrays
+of graph.GraphIndex (see GraphIndex.shortest_path). They are kept for code
+that searches over Node objects.
+"""
+
+import heapq
+from collections import deque
+from itertools import count
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,13 +20,27 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+
+        # How many nodes of each state are in the frontier, for O(1) lookups
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
-    
+        self.track(node)
+
+    def track(self, node):
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def untrack(self, node):
+        remaining = self.states[node.state] - 1
+        if remaining:
+            self.states[node.state] = remaining
+        else:
+            del self.states[node.state]
+
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,8 +49,8 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.untrack(node)
             return node
 
 
@@ -33,6 +60,27 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.untrack(node)
+            return node
+
+
+class PriorityFrontier(StackFrontier):
+    def __init__(self):
+        super().__init__()
+        self.frontier = []
+
+        # Tie breaker so nodes with equal priority come out in insertion order
+        self.counter = count()
+
+    def add(self, node, priority=0):
+        heapq.heappush(self.frontier, (priority, next(self.counter), node))
+        self.track(node)
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = heapq.heappop(self.frontier)[2]
+            self.untrack(node)
             return node
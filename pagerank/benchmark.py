@@ -0,0 +1,205 @@
+"""
+Synthetic web graphs and benchmarks for pagerank.
+
+Usage: python benchmark.py [--pages N] [--dangling F] [--degree uniform|powerlaw]
+                           [--mean-links K] [--samples N] [--seed S]
+                           [--html DIRECTORY] [--output FILE]
+
+A corpus is generated in memory, or written as a directory of HTML pages
+with --html so that crawl is timed as well. Every PageRank engine is timed
+on it, and its L1 distance to a tightly converged reference is reported.
+The results are written as JSON (to standard output by default).
+"""
+
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import pagerank
+from crawler import cache_path
+from engine import LinkGraph, SOLVERS, solve
+from outofcore import build_from_corpus, outofcore_pagerank
+
+PAGES = 10000
+DANGLING = 0.1
+DEGREE = "powerlaw"
+MEAN_LINKS = 5
+SAMPLES = 100000
+SEED = 0
+
+# Tolerance of the reference ranks every engine is compared to
+REFERENCE_TOLERANCE = 1e-12
+
+
+def main():
+    usage = ("Usage: python benchmark.py [--pages N] [--dangling F] [--degree uniform|powerlaw]\n"
+             "                           [--mean-links K] [--samples N] [--seed S]\n"
+             "                           [--html DIRECTORY] [--output FILE]")
+    args = sys.argv[1:]
+    options = {"--pages": PAGES, "--dangling": DANGLING, "--degree": DEGREE,
+               "--mean-links": MEAN_LINKS, "--samples": SAMPLES, "--seed": SEED,
+               "--html": None, "--output": None}
+    try:
+        for option, default in options.items():
+            if option in args:
+                i = args.index(option)
+                options[option] = args[i + 1] if default is None else type(default)(args[i + 1])
+                del args[i:i + 2]
+    except (IndexError, ValueError):
+        sys.exit(usage)
+    if args or options["--degree"] not in ("uniform", "powerlaw"):
+        sys.exit(usage)
+
+    corpus = generate_corpus(options["--pages"], options["--dangling"], options["--degree"],
+                             options["--mean-links"], options["--seed"])
+    report = run(corpus, options["--samples"], options["--seed"], options["--html"])
+    report["corpus"] = {
+        "pages": options["--pages"],
+        "dangling": options["--dangling"],
+        "degree": options["--degree"],
+        "mean_links": options["--mean-links"],
+        "seed": options["--seed"],
+    }
+
+    text = json.dumps(report, indent=2)
+    if options["--output"] is None:
+        print(text)
+    else:
+        with open(options["--output"], "w") as f:
+            f.write(text + "\n")
+
+
+def generate_corpus(pages=PAGES, dangling=DANGLING, degree=DEGREE,
+                    mean_links=MEAN_LINKS, seed=SEED):
+    """
+    Return a corpus dictionary of `pages` pages, a `dangling` fraction of
+    them without links. The others link to about `mean_links` pages each,
+    either uniformly or with power-law distributed out-degrees and
+    popularity ("powerlaw").
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+
+    if degree == "powerlaw":
+        # Pareto out-degrees and a few very popular link targets
+        weights = list(itertools.accumulate((i + 1) ** -1.0 for i in range(pages)))
+        popular = names[:]
+        rng.shuffle(popular)
+    corpus = {}
+    for name in names:
+        if rng.random() < dangling or pages < 2:
+            corpus[name] = set()
+            continue
+        if degree == "powerlaw":
+            count = min(pages - 1, max(1, int(rng.paretovariate(1.5) * mean_links / 3)))
+            links = set(rng.choices(popular, cum_weights=weights, k=count))
+        else:
+            count = min(pages - 1, rng.randint(1, 2 * mean_links - 1))
+            links = set(rng.sample(names, count))
+        # A page that only drew itself ends up without links
+        corpus[name] = links - {name}
+    return corpus
+
+
+def write_html(directory, corpus):
+    """
+    Write `corpus` as a directory of HTML pages that crawl can read.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<head><title>{page}</title></head>\n<body>\n")
+            for link in sorted(links):
+                f.write(f'<p><a class="link" href="{link}">{link}</a></p>\n')
+            f.write("</body>\n</html>\n")
+
+
+def timed(function, *args, **kwargs):
+    """
+    Return (result of the call, seconds it took).
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def l1(ranks, reference):
+    """
+    L1 distance between two page -> rank dictionaries.
+    """
+    return sum(abs(ranks.get(page, 0) - value) for page, value in reference.items())
+
+
+def run(corpus, samples=SAMPLES, seed=SEED, html=None):
+    """
+    Benchmark every engine on `corpus` and return the results.
+    """
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "links": sum(len(links) for links in corpus.values()),
+        "engines": {},
+    }
+    engines = report["engines"]
+
+    # Crawling, first without and then with the link cache
+    if html is not None:
+        write_html(html, corpus)
+        crawled, seconds = timed(pagerank.crawl, html, cache=False)
+        report["crawl_s"] = seconds
+        cache = cache_path(html)
+        if os.path.exists(cache):
+            os.remove(cache)
+        _, report["crawl_cache_cold_s"] = timed(pagerank.crawl, html)
+        _, report["crawl_cache_warm_s"] = timed(pagerank.crawl, html)
+        report["crawl_matches_corpus"] = crawled == corpus
+
+    graph, report["graph_build_s"] = timed(LinkGraph.from_corpus, corpus)
+    reference = graph.to_dict(solve(graph, pagerank.DAMPING, tolerance=REFERENCE_TOLERANCE)[0])
+
+    ranks, seconds = timed(pagerank.iterate_pagerank, corpus, pagerank.DAMPING)
+    engines["iterate_pagerank"] = {"seconds": seconds, "l1": l1(ranks, reference)}
+
+    for solver in SOLVERS:
+        telemetry = []
+        (values, iterations), seconds = timed(solve, graph, pagerank.DAMPING, solver,
+                                              callback=telemetry.append)
+        engines[f"solve_{solver}"] = {
+            "seconds": seconds,
+            "iterations": iterations,
+            "final_residual": telemetry[-1]["residual"] if telemetry else None,
+            "l1": l1(graph.to_dict(values), reference),
+        }
+
+    ranks, seconds = timed(pagerank.sample_pagerank, corpus, pagerank.DAMPING, samples, seed=seed)
+    engines["sample_pagerank"] = {"seconds": seconds, "samples": samples, "l1": l1(ranks, reference)}
+
+    ranks, seconds = timed(pagerank.sample_pagerank, corpus, pagerank.DAMPING, samples,
+                           seed=seed, processes=os.cpu_count())
+    engines["sample_pagerank_parallel"] = {"seconds": seconds, "samples": samples,
+                                           "processes": os.cpu_count(), "l1": l1(ranks, reference)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        _, build_seconds = timed(build_from_corpus, directory, corpus)
+        (values, iterations), seconds = timed(outofcore_pagerank, directory, pagerank.DAMPING)
+        engines["outofcore"] = {
+            "build_seconds": build_seconds,
+            "seconds": seconds,
+            "iterations": iterations,
+            "l1": l1(graph.to_dict(np.array(values)), reference),
+        }
+        del values
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Parallel crawler for a directory of HTML pages.
+
+Links are extracted while each file is read in blocks, so no page is ever
+held in memory whole, and files are parsed on a pool of worker processes.
+The links found in every file are kept in a cache file, keyed by file
+name, size and modification time, so later crawls only parse the files that
+changed. Cache files live in the user's cache directory, one per corpus
+directory, so crawling never writes into the corpus itself.
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Where the link caches of every corpus are kept
+CACHE_DIRECTORY = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "pagerank"
+)
+
+# Bump whenever the way links are extracted changes
+CACHE_VERSION = 1
+
+# Size of the blocks files are read in
+BLOCK_SIZE = 1 << 16
+
+# Below this many files to parse, a pool costs more than it saves
+POOL_THRESHOLD = 256
+
+
+def extract_links(path):
+    """
+    Return the set of href values of the <a> tags in the file at `path`,
+    reading it one block at a time.
+    """
+    links = set()
+    tail = ""
+    with open(path) as f:
+        while True:
+            block = f.read(BLOCK_SIZE)
+            if not block:
+                break
+            text = tail + block
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+
+            # A tag cut off by the end of the block is kept for the next one
+            start = text.rfind("<", end)
+            tail = text[start:] if start != -1 and ">" not in text[start:] else ""
+
+    return links
+
+
+def cache_path(directory):
+    """
+    Return the path of the link cache of the corpus in `directory`.
+    """
+    key = hashlib.sha1(os.path.realpath(directory).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIRECTORY, f"links-{key}.json")
+
+
+def load_cache(path):
+    """
+    Return the cached {filename: [size, mtime_ns, links]} entries, or {}.
+    """
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def save_cache(path, files):
+    """
+    Write the cache entries to `path`, ignoring a cache directory that
+    can't be written.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary, "w") as f:
+            json.dump({"version": CACHE_VERSION, "files": files}, f)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def crawl_links(directory, workers=None, cache=True):
+    """
+    Return {filename: set of hrefs} for every .html file of `directory`,
+    parsing only files that are new or changed since the cached crawl.
+    """
+    path = cache_path(directory)
+    cached = load_cache(path) if cache else {}
+
+    files = {}
+    stale = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".html") or not entry.is_file():
+            continue
+        stat = entry.stat()
+        previous = cached.get(entry.name)
+        if previous is not None and previous[:2] == [stat.st_size, stat.st_mtime_ns]:
+            files[entry.name] = previous
+        else:
+            files[entry.name] = [stat.st_size, stat.st_mtime_ns, None]
+            stale.append(entry.name)
+
+    # Parse new and changed files, on a pool when there are many of them
+    paths = [os.path.join(directory, filename) for filename in stale]
+    if len(paths) >= POOL_THRESHOLD and workers != 1:
+        with ProcessPoolExecutor(workers) as pool:
+            found = list(pool.map(extract_links, paths, chunksize=64))
+    else:
+        found = map(extract_links, paths)
+    for filename, links in zip(stale, found):
+        files[filename][2] = sorted(links)
+
+    if cache and (stale or len(files) != len(cached)):
+        save_cache(path, files)
+
+    return {filename: set(entry[2]) for filename, entry in files.items()}
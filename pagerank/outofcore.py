@@ -0,0 +1,175 @@
+"""
+Out-of-core PageRank over a memory-mapped edge list.
+
+A link graph is stored in a directory of .npy files:
+
+    sources.npy, destinations.npy   one entry per link, sorted by destination
+    out_degree.npy                  number of links of every page
+    pages.txt                       optional page names, one per line
+    meta.json                       number of pages and links
+
+Building the files only holds one bucket of links in memory at a time, and
+every PageRank iteration streams over the links in blocks, adding each
+block's contributions to the contiguous range of destinations it covers.
+The rank vectors are memory-mapped files too, so resident memory is bounded
+by the block size rather than by the size of the graph.
+"""
+
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from engine import LinkGraph, TOLERANCE, MAX_ITERATIONS
+
+# Links handled at once while iterating
+BLOCK = 1 << 22
+
+# Destination buckets the links are partitioned into while building
+BUCKETS = 64
+
+
+def index_dtype(num_pages):
+    """
+    Smallest integer type that can number `num_pages` pages.
+    """
+    return np.int32 if num_pages <= np.iinfo(np.int32).max else np.int64
+
+
+def build_edge_list(directory, num_pages, chunks, pages=None, buckets=BUCKETS):
+    """
+    Write the edge list files of a graph with `num_pages` pages into
+    `directory`. `chunks` yields (sources, destinations) integer arrays
+    of links; links must not repeat. `pages` optionally names the pages.
+    """
+    os.makedirs(directory, exist_ok=True)
+    dtype = index_dtype(num_pages)
+    width = max(1, -(-num_pages // buckets))
+    out_degree = open_memmap(os.path.join(directory, "out_degree.npy"), mode="w+",
+                             dtype=np.int64, shape=(num_pages,))
+    out_degree[:] = 0
+
+    # First pass: count links per page and split them by destination range
+    bucket_paths = [os.path.join(directory, f"bucket{b}.tmp") for b in range(buckets)]
+    bucket_sizes = [0] * buckets
+    for path in bucket_paths:
+        if os.path.exists(path):
+            os.remove(path)
+    for sources, destinations in chunks:
+        sources = np.asarray(sources, dtype=dtype)
+        destinations = np.asarray(destinations, dtype=dtype)
+        np.add.at(out_degree, sources, 1)
+        bucket = destinations // width
+        for b in np.unique(bucket):
+            mask = bucket == b
+            with open(bucket_paths[b], "ab") as f:
+                np.stack([sources[mask], destinations[mask]], axis=1).tofile(f)
+            bucket_sizes[b] += int(mask.sum())
+    out_degree.flush()
+
+    # Second pass: sort every bucket by destination and append it
+    num_links = sum(bucket_sizes)
+    sources_out = open_memmap(os.path.join(directory, "sources.npy"), mode="w+",
+                              dtype=dtype, shape=(num_links,))
+    destinations_out = open_memmap(os.path.join(directory, "destinations.npy"), mode="w+",
+                                   dtype=dtype, shape=(num_links,))
+    position = 0
+    for b, path in enumerate(bucket_paths):
+        if bucket_sizes[b] == 0:
+            continue
+        links = np.fromfile(path, dtype=dtype).reshape(-1, 2)
+        order = np.argsort(links[:, 1], kind="stable")
+        end = position + len(links)
+        sources_out[position:end] = links[order, 0]
+        destinations_out[position:end] = links[order, 1]
+        position = end
+        del links, order
+        os.remove(path)
+    sources_out.flush()
+    destinations_out.flush()
+
+    if pages is not None:
+        with open(os.path.join(directory, "pages.txt"), "w") as f:
+            for page in pages:
+                f.write(f"{page}\n")
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"pages": num_pages, "links": num_links}, f)
+
+
+def build_from_corpus(directory, corpus):
+    """
+    Write the edge list files of a corpus dictionary (see pagerank.crawl).
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    sources, destinations = graph.links()
+    build_edge_list(directory, len(graph), [(sources, destinations)], graph.pages)
+
+
+def load_pages(directory):
+    """
+    Return the list of page names stored with the edge list.
+    """
+    with open(os.path.join(directory, "pages.txt")) as f:
+        return [line.rstrip("\n") for line in f]
+
+
+def outofcore_pagerank(directory, damping_factor, tolerance=TOLERANCE,
+                       max_iterations=MAX_ITERATIONS, block=BLOCK):
+    """
+    Run PageRank over the edge list in `directory`, streaming `block`
+    links at a time. Returns (ranks, iterations), where ranks is a
+    read-only memory-mapped array saved as ranks.npy in `directory`
+    (an empty in-memory array for a graph without pages).
+    """
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    n = meta["pages"]
+    if n == 0:
+        return np.zeros(0), 0
+    sources = np.load(os.path.join(directory, "sources.npy"), mmap_mode="r")
+    destinations = np.load(os.path.join(directory, "destinations.npy"), mmap_mode="r")
+    out_degree = np.load(os.path.join(directory, "out_degree.npy"), mmap_mode="r")
+
+    paths = [os.path.join(directory, "ranks.npy"), os.path.join(directory, "ranks.next.npy")]
+    ranks = open_memmap(paths[0], mode="w+", dtype=np.float64, shape=(n,))
+    new_ranks = open_memmap(paths[1], mode="w+", dtype=np.float64, shape=(n,))
+    ranks[:] = 1 / n
+
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        # Pages without links spread their rank over every page
+        dangling = 0.0
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            dangling += ranks[start:stop][out_degree[start:stop] == 0].sum()
+        new_ranks[:] = (1 - damping_factor) / n + damping_factor * dangling / n
+
+        # Links are sorted by destination, so a block covers one range of pages
+        for start in range(0, len(sources), block):
+            block_sources = np.asarray(sources[start:start + block])
+            block_destinations = np.asarray(destinations[start:start + block])
+            shares = ranks[block_sources] / out_degree[block_sources]
+            low = int(block_destinations[0])
+            high = int(block_destinations[-1]) + 1
+            new_ranks[low:high] += damping_factor * np.bincount(
+                block_destinations - low, weights=shares, minlength=high - low)
+
+        change = 0.0
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            change += np.abs(new_ranks[start:stop] - ranks[start:stop]).sum()
+
+        ranks, new_ranks = new_ranks, ranks
+        paths.reverse()
+        if change < tolerance:
+            break
+
+    # Leave the final ranks in ranks.npy
+    ranks.flush()
+    del ranks, new_ranks
+    if paths[0] != os.path.join(directory, "ranks.npy"):
+        os.replace(paths[0], paths[1])
+    else:
+        os.remove(paths[1])
+    return np.load(os.path.join(directory, "ranks.npy"), mmap_mode="r"), iteration
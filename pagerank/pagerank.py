@@ -1,8 +1,12 @@
-import os
-import random
-import re
 import sys
-from numpy.random import choice
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from crawler import crawl_links
+from engine import LinkGraph, solve, TOLERANCE, MAX_ITERATIONS, CHUNK_SIZE
+from engine import personalized_pagerank as engine_personalized
+from sampler import confident_counts, parallel_counts, walk_counts
 
 DAMPING = 0.85
 SAMPLES = 10000
@@ -22,22 +26,20 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, workers=None, cache=True):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
 
+    Pages are parsed in parallel by `workers` processes. With `cache`,
+    the links found are saved inside the directory and only pages that
+    changed since the last crawl are parsed again.
+    """
     # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    pages = crawl_links(directory, workers, cache)
+    for filename in pages:
+        pages[filename] -= {filename}
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -90,7 +92,7 @@ def transition_model(corpus, page, damping_factor):
     return transition_dic
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None, walkers=None, processes=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -98,44 +100,41 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-    # Obtain the list of pages from the corpus
-    pages = list(corpus.keys())
 
-    # Dictionary to store PageRank values
-    page_rank = {}
-
-    # Initially every page start with 0 
-    for page in pages:
-        page_rank[page] = 0
-    
-    # First page is chosen randomly with the same probability
-    pick = random.choice(pages)
-
-    # Iterate n sample times
-    for i in range(n):
-        
-        # Use the transition model function to obtain the probability distribution, given the page
-        result = transition_model(corpus, pick, damping_factor)
-
-        result_pages = list(result.keys())
-        result_prob_values = list(result.values())
-
-        # Randomly choose a page based on the probability obtained from the transition model function
-        pick = choice(result_pages, 1, p=result_prob_values)
-        pick = pick[0]
+    The samples are taken by `walkers` random surfers moving together;
+    runs with the same `seed` give the same result. With `processes`, the
+    samples are split across that many worker processes, each with its own
+    random stream, and their visit counts are added up.
+    """
+    # Out-link arrays are built once for the whole run
+    graph = LinkGraph.from_corpus(corpus)
 
-        # Keep track the number of times every page has been chosen
-        page_rank[pick] += 1
+    # Keep track the number of times every page has been chosen
+    if processes is None:
+        counts = walk_counts(graph, damping_factor, n, np.random.default_rng(seed), walkers)
+    else:
+        counts = parallel_counts(graph, damping_factor, n, seed, walkers, processes)
 
     # Obtain the PageRank, divide each counter with the number of samples
-    for key, count in page_rank.items():
-        page_rank[key] = count/n
+    return graph.to_dict(counts / n)
 
-    return page_rank
 
+def sample_pagerank_to_confidence(corpus, damping_factor, half_width, top_k=10,
+                                  seed=None, processes=None):
+    """
+    Return (PageRank values, number of samples) by sampling until the 95%
+    confidence interval of each of the `top_k` highest PageRank values
+    is within +/- `half_width`.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    counts, n = confident_counts(graph, damping_factor, half_width, top_k,
+                                 seed=seed, processes=processes)
+    return graph.to_dict(counts / n), n
 
-def iterate_pagerank(corpus, damping_factor):
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     max_iterations=MAX_ITERATIONS, previous=None,
+                     solver="jacobi", callback=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -143,64 +142,63 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    The iteration stops once the L1 norm of the residual (the change one
+    more iteration would make) is below `tolerance`, or after `max_iterations`.
+    `corpus` is left unchanged.
+
+    `solver` picks one of engine.SOLVERS, and `callback` receives the
+    residual, elapsed time and changed page count of every iteration.
+
+    `previous` can hold the PageRank values of an earlier version of the
+    corpus; the iteration then starts from them, which converges in far
+    fewer iterations after small edits.
     """
+    # Build the sparse link matrix once, pages without links spread their rank evenly
+    graph = LinkGraph.from_corpus(corpus)
 
-    # Obtain the list of pages from the corpus
-    pages = list(corpus.keys())
+    # Warm start from the previous values, pages new to the corpus start even
+    start = None
+    if previous is not None and len(graph) > 0:
+        start = np.array([previous.get(page, 1 / len(graph)) for page in graph.pages])
+        start /= start.sum()
 
-    # Check if any of the pages does not link to any other page. If that is true, consider the page to link every page in the corpus
-    for corpus_key, corpus_value in corpus.items():
-        if len(corpus_value) == 0:
-            corpus[corpus_key] = set(corpus.keys())
+    # Vectorized power iteration over the whole corpus at once
+    ranks, _ = solve(graph, damping_factor, solver, tolerance, max_iterations, start, callback)
 
-    # Dictionary to store PageRank values
-    page_rank = {}
+    return graph.to_dict(ranks)
 
-    # Number of pages in the corpus
-    num_pages = len(corpus.keys())
 
-    # 1 - dampling_factor
-    negative_df = 1 - damping_factor
-    initial_state = negative_df/num_pages
-
-    # Set the initial state of the PageRank
-    for page in pages:
-        page_rank[page] = initial_state
-
-    # Loop until every PageRank value converge, with difference between previous and new value less than 0,001
-    difference = True
-    while(difference):
-
-        # Variable to keep track of the number of pages that has converged
-        count_diff = 0
-
-        # Iterate through every element in the corpus
-        for key, page in corpus.items():
-            # Initialice the sumation variable
-            sumation = 0
-            
-            # Iterate through every element in the corpus once again
-            for i_key, i_value in corpus.items():
-                
-                # Seach if the page is linked by another page in the corpus and apply the relation and add the result to the sumation
-                if key in i_value:
-                    sumation += page_rank[i_key]/len(corpus[i_key])
-
-            # Pagerank using the formula            
-            new_page_rank = negative_df/num_pages + damping_factor*sumation
-
-            # Count the number of pages that has converged
-            if (new_page_rank - page_rank[key]) < 0.001:
-                count_diff += 1
-            
-            # Update the values from the PageRank
-            page_rank[key] = new_page_rank
-
-        # Leave the while loop if every page has converged
-        if count_diff == num_pages:
-            difference = False
-
-    return page_rank
+def personalized_pagerank(corpus, damping_factor, seed_sets, k=10, chunk_size=CHUNK_SIZE):
+    """
+    Return topic-sensitive PageRank for every seed set in `seed_sets`,
+    where the surfer only ever jumps to pages of its seed set.
+
+    Return a list with one entry per seed set: the `k` pages with the
+    highest PageRank as (page, value) pairs, best first. Pages the
+    surfer never reaches are left out, so the list is shorter than `k`
+    when fewer pages can be reached, and empty if none of the seed set's
+    pages are in the corpus. Seed sets are ranked
+    `chunk_size` at a time.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+
+    # One teleport row per seed set, spread evenly over its pages
+    rows = []
+    columns = []
+    for row, seeds in enumerate(seed_sets):
+        for page in seeds:
+            if page in graph.index:
+                rows.append(row)
+                columns.append(graph.index[page])
+    teleports = csr_matrix((np.ones(len(rows)), (rows, columns)),
+                           shape=(len(seed_sets), len(graph)))
+
+    pages, values = engine_personalized(graph, damping_factor, teleports, k, chunk_size)
+    return [
+        [(graph.pages[page], value) for page, value in zip(page_row, value_row) if page != -1]
+        for page_row, value_row in zip(pages.tolist(), values.tolist())
+    ]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+"""
+Vectorized random surfer for sampling PageRank.
+
+Instead of one surfer asking the transition model for a full distribution
+on every step, many independent surfers move at once using the out-link
+CSR arrays of a LinkGraph. Every link of a page is equally likely, so a
+uniform draw into the page's slice of the link array stands in for an
+alias table, and the damping coin decides between following a link and
+jumping to a uniformly random page.
+"""
+
+import math
+import multiprocessing
+
+import numpy as np
+
+# Most surfers moving at the same time
+WALKERS = 1024
+
+# Fewest steps each surfer takes, so its start page is soon forgotten
+MIN_STEPS = 100
+
+# Surfers take uncounted steps until their start page weighs less than this
+BURN_IN_TOLERANCE = 1e-4
+
+# Most uncounted steps a surfer takes, for damping factors close to 1
+MAX_BURN_IN = 1000
+
+# Visits buffered before they are added to the counts
+BUFFER = 1 << 20
+
+# Independent runs per round when sampling to a confidence interval
+REPLICATES = 8
+
+# Normal quantile of a 95% confidence interval
+Z = 1.96
+
+# Graph used by the worker processes, set when the pool starts
+worker_graph = None
+
+
+def default_walkers(n):
+    """
+    Number of surfers used to take `n` samples.
+    """
+    return max(1, min(WALKERS, n // MIN_STEPS))
+
+
+def burn_in(damping_factor):
+    """
+    Number of uncounted steps every surfer takes first. A surfer forgets
+    its start page at the rate it jumps, so after t steps the start page
+    only weighs damping_factor ** t.
+    """
+    if damping_factor <= 0:
+        return 0
+    if damping_factor >= 1:
+        return MAX_BURN_IN
+    return min(MAX_BURN_IN, math.ceil(math.log(BURN_IN_TOLERANCE) / math.log(damping_factor)))
+
+
+def step(graph, damping_factor, current, rng):
+    """
+    Move every surfer in `current` one step, and return their new pages.
+    """
+    degree = graph.out_degree[current]
+
+    # Follow a link with probability `damping_factor`, if there is one
+    follow = (rng.random(len(current)) < damping_factor) & (degree > 0)
+    following = current[follow]
+    choice = (rng.random(len(following)) * degree[follow]).astype(np.int64)
+    current = current.copy()
+    current[follow] = graph.targets[graph.offsets[following] + choice]
+
+    # Otherwise jump to any page of the corpus
+    jumping = ~follow
+    current[jumping] = rng.integers(len(graph), size=int(jumping.sum()))
+    return current
+
+
+def walk_counts(graph, damping_factor, n, rng, walkers=None):
+    """
+    Take `n` samples of the random surfer on `graph` using the numpy
+    Generator `rng`, and return how many times each page was visited.
+
+    Every surfer starts on a page chosen at random and takes burn_in
+    uncounted steps, so the start pages don't bias the counts; each of
+    its later steps counts as one sample.
+    """
+    return walk(graph, damping_factor, n, rng, walkers)[0]
+
+
+def walk(graph, damping_factor, n, rng, walkers=None, start=None):
+    """
+    Take `n` samples like walk_counts, and return (visit counts, pages
+    the surfers are on). With `start`, the surfers carry on from those
+    pages, already burnt in, instead of starting over.
+    """
+    size = len(graph)
+    counts = np.zeros(size, dtype=np.int64)
+    if n <= 0 or size == 0:
+        return counts, start
+
+    if start is not None:
+        current = np.array(start, dtype=np.int64)
+    else:
+        if walkers is None:
+            walkers = default_walkers(n)
+        current = rng.integers(size, size=min(walkers, n))
+        for _ in range(burn_in(damping_factor)):
+            current = step(graph, damping_factor, current, rng)
+
+    remaining = n
+    visits = []
+    buffered = 0
+    while remaining > 0:
+        # The last step only moves as many surfers as samples are left
+        moving = min(remaining, len(current))
+        current[:moving] = step(graph, damping_factor, current[:moving], rng)
+
+        visits.append(current[:moving].copy())
+        buffered += moving
+        remaining -= moving
+        if buffered >= BUFFER or remaining <= 0:
+            counts += np.bincount(np.concatenate(visits), minlength=size)
+            visits = []
+            buffered = 0
+
+    return counts, current
+
+
+def set_worker_graph(graph):
+    global worker_graph
+    worker_graph = graph
+
+
+def count_chunk(damping_factor, n, seed, walkers):
+    """
+    Worker side of a parallel run: sample `n` pages from the RNG stream
+    `seed` and return the visit counts.
+    """
+    return walk_counts(worker_graph, damping_factor, n, np.random.default_rng(seed), walkers)
+
+
+def walk_chunk(damping_factor, n, seed, walkers, start):
+    """
+    Worker side of a run that goes on over several rounds: sample `n`
+    pages from the RNG stream `seed`, with surfers continuing from
+    `start` (None the first time), and return (visit counts, pages the
+    surfers are on).
+    """
+    return walk(worker_graph, damping_factor, n, np.random.default_rng(seed), walkers, start)
+
+
+def start_pool(graph, processes):
+    """
+    Return a process pool whose workers hold `graph`, or None to sample
+    in this process. Forked workers share the graph instead of a copy.
+    """
+    if processes is None or processes <= 1:
+        set_worker_graph(graph)
+        return None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    return context.Pool(processes, set_worker_graph, (graph,))
+
+
+def chunk_counts(pool, damping_factor, sizes, seeds, walkers):
+    """
+    Return the list of visit counts of one chunk of samples per entry
+    in `sizes`, each from its own RNG stream in `seeds`.
+    """
+    tasks = [(damping_factor, size, seed, walkers) for size, seed in zip(sizes, seeds)]
+    if pool is None:
+        return [count_chunk(*task) for task in tasks]
+    return pool.starmap(count_chunk, tasks)
+
+
+def split(n, parts):
+    """
+    Split `n` into `parts` sizes that differ by at most one.
+    """
+    return [n // parts + (1 if i < n % parts else 0) for i in range(parts)]
+
+
+def parallel_counts(graph, damping_factor, n, seed=None, walkers=None, processes=None):
+    """
+    Sample `n` pages split across `processes` worker processes, each with
+    an independent RNG stream spawned from `seed`, and return the merged
+    visit counts. The same seed and number of processes give the same counts.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+    pool = start_pool(graph, processes)
+    try:
+        counts = chunk_counts(pool, damping_factor, split(n, processes), seeds, walkers)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return np.sum(counts, axis=0)
+
+
+def confident_counts(graph, damping_factor, half_width, top_k=10, batch=100000,
+                     max_samples=100000000, seed=None, walkers=None, processes=None):
+    """
+    Keep sampling in rounds of `batch` samples until the 95% confidence
+    interval of every one of the `top_k` highest ranks is within
+    +/- `half_width`, or `max_samples` samples have been taken.
+
+    Every round is made of independent runs of equal size, and the
+    spread of their estimates gives the confidence interval, which also
+    accounts for the correlation between the steps of a surfer. Every
+    run carries on with the surfers of the same run in the last round,
+    so start-up bias, which the spread can't show, is only paid once.
+    Returns (counts, number of samples).
+    """
+    size = len(graph)
+    replicates = max(REPLICATES, processes or 1)
+    chunk = max(1, batch // replicates)
+    root = np.random.SeedSequence(seed)
+
+    counts = np.zeros(size, dtype=np.int64)
+    estimates = np.zeros(size)
+    squares = np.zeros(size)
+    runs = 0
+    samples = 0
+
+    positions = [None] * replicates
+
+    pool = start_pool(graph, processes)
+    try:
+        while samples < max_samples:
+            tasks = [(damping_factor, chunk, seed, walkers, start)
+                     for seed, start in zip(root.spawn(replicates), positions)]
+            if pool is None:
+                walks = [walk_chunk(*task) for task in tasks]
+            else:
+                walks = pool.starmap(walk_chunk, tasks)
+            positions = [position for _, position in walks]
+
+            for result, _ in walks:
+                counts += result
+                estimate = result / chunk
+                estimates += estimate
+                squares += estimate * estimate
+            runs += replicates
+            samples += chunk * replicates
+
+            # Confidence interval of the mean of the independent runs
+            mean = estimates / runs
+            variance = np.maximum(squares / runs - mean * mean, 0) * runs / (runs - 1)
+            top = np.argsort(-mean)[:top_k]
+            if Z * np.sqrt(variance[top] / runs).max() <= half_width:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return counts, samples
@@ -0,0 +1,147 @@
+"""
+Bitboard representation of a tictactoe board.
+
+Cell (i, j) is bit 3 * i + j, and a position is two 9-bit masks: the cells
+taken by X and the cells taken by O. Whether a mask holds a line, which
+cells of a board are empty and how a board looks rotated or reflected are
+all looked up in tables indexed by masks, built once at import.
+"""
+
+SIZE = 3
+CELLS = SIZE * SIZE
+FULL = (1 << CELLS) - 1
+
+# Rows, columns and diagonals
+LINES = (
+    [sum(1 << (SIZE * i + j) for j in range(SIZE)) for i in range(SIZE)]
+    + [sum(1 << (SIZE * i + j) for i in range(SIZE)) for j in range(SIZE)]
+    + [sum(1 << (SIZE * i + i) for i in range(SIZE)),
+       sum(1 << (SIZE * i + SIZE - 1 - i) for i in range(SIZE))]
+)
+
+# Whether a mask holds a complete line
+WINNING = [any(mask & line == line for line in LINES) for mask in range(1 << CELLS)]
+
+# Number of cells in a mask
+COUNT = [bin(mask).count("1") for mask in range(1 << CELLS)]
+
+# Empty cells of a board, given the mask of the cells taken
+FREE = [tuple(cell for cell in range(CELLS) if not occupied >> cell & 1)
+        for occupied in range(1 << CELLS)]
+
+# The 8 rotations and reflections of the board. Each one lists, for every
+# cell of the transformed board, the cell of the board it comes from.
+TRANSFORMS = [
+    lambda i, j: (i, j),
+    lambda i, j: (2 - j, i),
+    lambda i, j: (2 - i, 2 - j),
+    lambda i, j: (j, 2 - i),
+    lambda i, j: (i, 2 - j),
+    lambda i, j: (2 - i, j),
+    lambda i, j: (j, i),
+    lambda i, j: (2 - j, 2 - i),
+]
+SYMMETRIES = [
+    tuple(SIZE * a + b for a, b in (transform(i, j) for i in range(SIZE) for j in range(SIZE)))
+    for transform in TRANSFORMS
+]
+
+# Every mask as it looks under each symmetry
+TRANSFORMED = [
+    [sum(1 << k for k, cell in enumerate(symmetry) if mask >> cell & 1)
+     for mask in range(1 << CELLS)]
+    for symmetry in SYMMETRIES
+]
+
+
+def canonical_key(x, o, x_to_move):
+    """
+    Return the key shared by a position and all of its rotations and
+    reflections: the smallest of their encodings, with the side to move.
+    """
+    return min(table[x] | table[o] << CELLS for table in TRANSFORMED) | x_to_move << 2 * CELLS
+
+
+def outcome(x, o):
+    """
+    Returns 1 if X has won, -1 if O has won, 0 for a tie, or None if
+    the game is not over.
+    """
+    if WINNING[x]:
+        return 1
+    if WINNING[o]:
+        return -1
+    if x | o == FULL:
+        return 0
+    return None
+
+
+class Bitboard():
+
+    __slots__ = ("x", "o", "x_to_move")
+
+    def __init__(self, x=0, o=0, x_to_move=None):
+        """
+        Create a position from the masks of X and O. Unless told
+        otherwise, X moves unless it has made more moves than O.
+        """
+        self.x = x
+        self.o = o
+        self.x_to_move = COUNT[x] <= COUNT[o] if x_to_move is None else x_to_move
+
+    @classmethod
+    def from_board(cls, board, x_to_move=None):
+        """
+        Create a position from a list of lists board.
+        """
+        x = 0
+        o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == "X":
+                    x |= 1 << (SIZE * i + j)
+                elif cell == "O":
+                    o |= 1 << (SIZE * i + j)
+        return cls(x, o, x_to_move)
+
+    def to_board(self):
+        """
+        Return the position as a list of lists board.
+        """
+        return [
+            ["X" if self.x >> (SIZE * i + j) & 1 else "O" if self.o >> (SIZE * i + j) & 1 else None
+             for j in range(SIZE)]
+            for i in range(SIZE)
+        ]
+
+    def free(self):
+        """
+        Return the empty cells.
+        """
+        return FREE[self.x | self.o]
+
+    def outcome(self):
+        return outcome(self.x, self.o)
+
+    def key(self):
+        return canonical_key(self.x, self.o, self.x_to_move)
+
+    def play(self, cell):
+        """
+        Make the move of the side to move on the empty `cell`.
+        """
+        if self.x_to_move:
+            self.x |= 1 << cell
+        else:
+            self.o |= 1 << cell
+        self.x_to_move = not self.x_to_move
+
+    def undo(self, cell):
+        """
+        Take back the last move, made on `cell`.
+        """
+        self.x_to_move = not self.x_to_move
+        if self.x_to_move:
+            self.x ^= 1 << cell
+        else:
+            self.o ^= 1 << cell
@@ -0,0 +1,318 @@
+"""
+Tic Tac Toe on larger boards: N x N, k in a row to win.
+
+Exhaustive search is hopeless beyond small boards, so this engine runs
+iterative-deepening alpha-beta under a wall-clock budget per move, and
+returns the best move found so far when time runs out.
+
+Positions are scored by line threats: every window of k cells in a row
+that only one player has stones in counts for that player, more the more
+stones it holds. The stone counts of every window, and the score, are
+updated as moves are made and taken back, so evaluating a position is free.
+"""
+
+import math
+import time
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Default seconds to think about a move
+BUDGET = 1.0
+
+# Only empty cells this close to a stone are considered
+RADIUS = 2
+
+# Most moves tried below the root, the most threatening first
+BREADTH = 12
+
+
+class OutOfTime(Exception):
+    pass
+
+
+class Game():
+
+    def __init__(self, size=15, length=5):
+        """
+        Create an empty `size` x `size` board where `length` stones in a
+        row (across, down or diagonally) win.
+        """
+        if not 1 <= length <= size:
+            raise ValueError("length must be between 1 and size")
+        self.size = size
+        self.length = length
+
+        # Every cell holds 1 for X, -1 for O and 0 when empty
+        self.cells = [0] * (size * size)
+        self.moves = []
+        self.to_move = 1
+        self.winner = 0
+
+        # Every window of `length` cells in a row, and the windows of every cell
+        self.windows = []
+        self.windows_of = [[] for _ in range(size * size)]
+        for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            for i in range(size):
+                for j in range(size):
+                    last_i = i + di * (length - 1)
+                    last_j = j + dj * (length - 1)
+                    if not (0 <= last_i < size and 0 <= last_j < size):
+                        continue
+                    for step in range(length):
+                        self.windows_of[(i + di * step) * size + j + dj * step].append(len(self.windows))
+                    self.windows.append(tuple((i + di * step) * size + j + dj * step for step in range(length)))
+
+        # Stones of each player in every window
+        self.counts = {1: [0] * len(self.windows), -1: [0] * len(self.windows)}
+
+        # Worth of an open window holding that many stones, and of a win
+        self.weights = [0] + [10 ** count for count in range(length)]
+        self.win = 10 * self.weights[length] * max(1, len(self.windows))
+
+        # Threat score of the position, positive when X is ahead
+        self.score = 0
+
+        # Search state
+        self.nodes = 0
+        self.deadline = math.inf
+
+    @classmethod
+    def from_board(cls, board, length):
+        """
+        Create a game from a square list of lists board of X, O and EMPTY.
+        """
+        game = cls(len(board), length)
+        stones = {1: [], -1: []}
+        for i, row in enumerate(board):
+            if len(row) != game.size:
+                raise ValueError("board is not square")
+            for j, cell in enumerate(row):
+                if cell == X:
+                    stones[1].append(i * game.size + j)
+                elif cell == O:
+                    stones[-1].append(i * game.size + j)
+        for side in (1, -1):
+            for cell in stones[side]:
+                game.to_move = side
+                game.play(cell)
+
+        # X moves unless it has made more moves than O
+        game.to_move = 1 if len(stones[1]) <= len(stones[-1]) else -1
+        return game
+
+    def over(self):
+        return self.winner != 0 or len(self.moves) == len(self.cells)
+
+    def play(self, cell):
+        """
+        Put a stone of the side to move on the empty `cell`.
+        """
+        side = self.to_move
+        own = self.counts[side]
+        other = self.counts[-side]
+        weights = self.weights
+        score = self.score
+
+        for w in self.windows_of[cell]:
+            count = own[w]
+            if other[w] == 0:
+                # The window grows for this side
+                score += side * (weights[count + 1] - weights[count])
+                if count + 1 == self.length:
+                    self.winner = side
+            elif count == 0:
+                # The window is lost to the opponent
+                score += side * weights[other[w]]
+            own[w] = count + 1
+
+        self.score = score
+        self.cells[cell] = side
+        self.moves.append(cell)
+        self.to_move = -side
+
+    def undo(self):
+        """
+        Take back the last move.
+        """
+        cell = self.moves.pop()
+        side = -self.to_move
+        own = self.counts[side]
+        other = self.counts[-side]
+        weights = self.weights
+        score = self.score
+
+        for w in self.windows_of[cell]:
+            count = own[w] - 1
+            own[w] = count
+            if other[w] == 0:
+                score -= side * (weights[count + 1] - weights[count])
+            elif count == 0:
+                score -= side * weights[other[w]]
+
+        self.score = score
+        self.cells[cell] = 0
+        self.to_move = side
+        self.winner = 0
+
+    def candidates(self):
+        """
+        Return the empty cells within RADIUS of a stone, or the center of
+        an empty board.
+        """
+        size = self.size
+        if not self.moves:
+            return [(size // 2) * size + size // 2]
+        cells = self.cells
+        found = set()
+        for stone in self.moves:
+            i, j = divmod(stone, size)
+            for a in range(max(0, i - RADIUS), min(size, i + RADIUS + 1)):
+                for b in range(max(0, j - RADIUS), min(size, j + RADIUS + 1)):
+                    if cells[a * size + b] == 0:
+                        found.add(a * size + b)
+        return list(found)
+
+    def threat(self, cell):
+        """
+        How much a stone of the side to move on `cell` would extend its
+        own windows and block the opponent's.
+        """
+        own = self.counts[self.to_move]
+        other = self.counts[-self.to_move]
+        weights = self.weights
+        total = 0
+        for w in self.windows_of[cell]:
+            if other[w] == 0:
+                total += weights[own[w] + 1]
+            elif own[w] == 0:
+                total += weights[other[w] + 1]
+        return total
+
+    def ordered(self, first=None, breadth=None):
+        """
+        Return the candidate moves, `first` first and then the most
+        threatening, keeping at most `breadth` of them.
+        """
+        moves = sorted(self.candidates(), key=self.threat, reverse=True)
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves if breadth is None else moves[:breadth]
+
+    def search(self, budget=BUDGET, max_depth=None, breadth=BREADTH):
+        """
+        Search the position with iterative deepening for at most `budget`
+        seconds, or until `max_depth` moves ahead. Returns (cell, value,
+        depth), where value is from the point of view of the side to move
+        and depth is the deepest search completed, or None if the game
+        is over.
+        """
+        if self.over():
+            return None
+        self.nodes = 0
+        self.deadline = time.monotonic() + budget
+        remaining = len(self.cells) - len(self.moves)
+        max_depth = remaining if max_depth is None else min(max_depth, remaining)
+
+        # Until a search completes, go with the most threatening move
+        moves = self.ordered()
+        best = (moves[0], self.to_move * self.score, 0)
+
+        for depth in range(1, max_depth + 1):
+            progress = {}
+            try:
+                cell, value = self.search_root(depth, best[0], breadth, progress)
+            except OutOfTime:
+                # A move that beat the previous best at this depth is better still
+                if progress.get("improved"):
+                    best = (progress["cell"], progress["value"], depth - 1)
+                break
+            best = (cell, value, depth)
+
+            # Stop once the game is decided
+            if abs(value) >= self.win - len(self.cells):
+                break
+
+        return best
+
+    def search_root(self, depth, first, breadth, progress):
+        """
+        Search every candidate move `depth` moves ahead, `first` first.
+        Returns (cell, value), and records the best move so far in
+        `progress` in case time runs out.
+        """
+        alpha = -math.inf
+        beta = math.inf
+        root = len(self.moves)
+        best_cell = None
+
+        for cell in self.ordered(first):
+            self.check_clock()
+            self.play(cell)
+            try:
+                value = -self.negamax(depth - 1, -beta, -alpha, 1, breadth)
+            except OutOfTime:
+                # Take back every move of the interrupted search
+                while len(self.moves) > root:
+                    self.undo()
+                raise
+            self.undo()
+
+            if best_cell is None or value > alpha:
+                progress["improved"] = best_cell is not None
+                progress["cell"] = best_cell = cell
+                progress["value"] = alpha = value
+
+        return best_cell, alpha
+
+    def negamax(self, depth, alpha, beta, ply, breadth):
+        """
+        Value of the position for the side to move, searched `depth`
+        moves ahead with alpha-beta pruning.
+        """
+        self.nodes += 1
+        self.check_clock()
+
+        # The previous move won, and sooner wins are better
+        if self.winner:
+            return -(self.win - ply)
+        if len(self.moves) == len(self.cells):
+            return 0
+        if depth == 0:
+            return self.to_move * self.score
+
+        best = -math.inf
+        for cell in self.ordered(breadth=breadth):
+            self.play(cell)
+            value = -self.negamax(depth - 1, -beta, -alpha, ply + 1, breadth)
+            self.undo()
+            if value > best:
+                best = value
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+        return best
+
+
+    def check_clock(self):
+        """
+        Raise OutOfTime once the deadline has passed. Reading the clock
+        costs far less than ordering the moves of a single node, so it
+        is read at every node.
+        """
+        if time.monotonic() >= self.deadline:
+            raise OutOfTime
+
+
+def best_move(board, length, budget=BUDGET, max_depth=None):
+    """
+    Returns the best action (i, j) found for the current player on a
+    list of lists board within `budget` seconds, or None if the game is over.
+    """
+    game = Game.from_board(board, length)
+    found = game.search(budget, max_depth)
+    if found is None:
+        return None
+    return divmod(found[0], game.size)
@@ -0,0 +1,171 @@
+"""
+Solved-game table for 3x3 tictactoe.
+
+Only a few thousand positions can be reached from the empty board, so all
+of them are solved once, and the value and best move of each are stored in
+a table indexed by the position read as a base-3 number: one byte per
+position, 3 ** 9 bytes in all. minimax then answers with a single lookup.
+
+Usage: python solved.py [FILE]
+
+Builds the table and writes it to FILE (solved.bin next to this module by
+default, which is shipped with the code). If that file is missing or out of
+date, the table is built the first time it is needed and kept in the user's
+cache directory instead.
+"""
+
+import os
+import sys
+
+from bitboard import CELLS, FREE, outcome
+
+# Location of the table shipped with the code
+FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solved.bin")
+
+# Where a table built on first use is kept
+CACHE_FILENAME = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "tictactoe", "solved.bin"
+)
+
+# Start of the table file; bump the last byte whenever the format changes
+MAGIC = b"TTT\x01"
+
+POSITIONS = 3 ** CELLS
+
+# Best move stored for a finished game
+NO_MOVE = 15
+
+# Base-3 number of a mask, with a 1 for every cell it holds
+TERNARY = [sum(3 ** cell for cell in range(CELLS) if mask >> cell & 1) for mask in range(1 << CELLS)]
+
+# Table loaded by lookup, read or built on first use
+table = None
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python solved.py [FILE]")
+    path = sys.argv[1] if len(sys.argv) == 2 else FILENAME
+    entries = build()
+    save(entries, path)
+    print(f"Solved {sum(1 for entry in entries if entry)} positions into {path}")
+
+
+def index(x, o):
+    """
+    Position of the board with masks `x` and `o` in the table.
+    """
+    return TERNARY[x] + 2 * TERNARY[o]
+
+
+def build():
+    """
+    Solve every position reachable from the empty board. Returns the
+    table: for every position, 0 if it can't be reached, or its value
+    plus 2 in the high four bits and its best cell in the low four bits.
+    """
+    entries = bytearray(POSITIONS)
+    solve(0, 0, True, entries, {})
+    return bytes(entries)
+
+
+def solve(x, o, x_to_move, entries, solved):
+    """
+    Returns (value, moves until the game ends) of a position with best
+    play, recording it and every position reachable from it in `entries`.
+    """
+    i = index(x, o)
+    if i in solved:
+        return solved[i]
+
+    score = outcome(x, o)
+    if score is not None:
+        entries[i] = (score + 2) << 4 | NO_MOVE
+        solved[i] = (score, 0)
+        return solved[i]
+
+    best = None
+    for cell in FREE[x | o]:
+        if x_to_move:
+            value, length = solve(x | 1 << cell, o, False, entries, solved)
+        else:
+            value, length = solve(x, o | 1 << cell, True, entries, solved)
+
+        # Both players want the best value, to win soon and to lose late
+        own = value if x_to_move else -value
+        rank = (own, -length if own > 0 else length)
+        if best is None or rank > best[0]:
+            best = (rank, cell, value, length)
+
+    _, cell, value, length = best
+    entries[i] = (value + 2) << 4 | cell
+    solved[i] = (value, length + 1)
+    return solved[i]
+
+
+def save(entries, path=FILENAME):
+    """
+    Write the table to `path`, ignoring a read-only directory.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(temporary, "wb") as f:
+            f.write(MAGIC)
+            f.write(entries)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read(path):
+    """
+    Return the table stored at `path`, or None if the file is missing
+    or out of date.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:len(MAGIC)] == MAGIC and len(data) == len(MAGIC) + POSITIONS:
+        return data[len(MAGIC):]
+    return None
+
+
+def load(path=FILENAME, cache_path=CACHE_FILENAME):
+    """
+    Return the table stored at `path`, or else at `cache_path`, building
+    it and saving it to `cache_path` if neither file holds it.
+    """
+    for candidate in (path, cache_path):
+        entries = read(candidate)
+        if entries is not None:
+            return entries
+
+    entries = build()
+    save(entries, cache_path)
+    return entries
+
+
+def lookup(x, o):
+    """
+    Returns (value, best cell) of the position with masks `x` and `o`,
+    where the cell is None if the game is over, or None if the position
+    can't be reached in a game.
+    """
+    global table
+    if table is None:
+        table = load()
+
+    entry = table[index(x, o)]
+    if entry == 0:
+        return None
+    cell = entry & 0xF
+    return (entry >> 4) - 2, None if cell == NO_MOVE else cell
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Transposition table for the tictactoe search.
+
+The value of a position does not change when the board is rotated or
+reflected, so positions are stored under a canonical key shared by the 8
+symmetries of the board (see bitboard.canonical_key). The table is bounded,
+and the least recently used positions are evicted first.
+
+Every entry is a (value, bound) pair. A search cut off by alpha-beta only
+learns a bound of the value, which still narrows the window the next time
+the position is searched.
+"""
+
+from collections import OrderedDict
+
+# Default number of positions kept
+CAPACITY = 1 << 16
+
+# What the value of an entry is: the value itself, or a bound of it
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TranspositionTable():
+
+    def __init__(self, capacity=CAPACITY):
+        """
+        Create an empty table holding at most `capacity` positions.
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key):
+        """
+        Return the (value, bound) stored for `key`, or None.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def store(self, key, value, bound=EXACT):
+        """
+        Store `value` for `key`, as the exact value or a LOWER or UPPER
+        bound of it, evicting the least recently used position when the
+        table is full.
+        """
+        self.entries[key] = (value, bound)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Drop every position and reset the counters.
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """
+        Return the table counters as a dictionary.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "positions": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -2,13 +2,35 @@
 Tic Tac Toe Player
 """
 
-from copy import deepcopy
 import math
 
+from bitboard import Bitboard, FREE, SIZE, WINNING, canonical_key, outcome
+from table import EXACT, LOWER, UPPER, TranspositionTable
+import solved
+
 X = "X"
 O = "O"
 EMPTY = None
 
+# Values of the positions already searched, shared by every call
+transpositions = TranspositionTable()
+
+# Cells tried first by alpha-beta: the center, then corners, then edges
+MOVE_ORDER = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+MOVE_RANK = [MOVE_ORDER.index(cell) for cell in range(SIZE * SIZE)]
+
+# Best and worst possible utility of a game
+WIN = 1
+LOSS = -1
+
+# Last cell that caused a cutoff at every depth, and how much every cell
+# has caused cutoffs, used by alpha-beta to try good moves first
+killers = {}
+history = {}
+
+# Positions expanded by each kind of search
+nodes = {"minimax": 0, "alphabeta": 0}
+
 
 def initial_state():
     """
@@ -23,43 +45,19 @@ def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    # Keep a counter of how many times each player has made a move
-    counter_x = 0
-    counter_o = 0
-
     # If the board is empty then X starts
     if board is None:
         return X
 
-    # Count how many times each player has moved
-    for row in board:
-        for cell in row:
-            if cell == X:
-                counter_x += 1
-            elif cell == O:
-                counter_o += 1
-
     # If X has more move than O then it's O's turn. Otherwise, it's X's turn.
-    if counter_x > counter_o:
-        return O
-
-    return X
+    return X if Bitboard.from_board(board).x_to_move else O
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    # Keep a set to store the possible actions
-    num_actions = set()
-
-    # If an empty cell is found, save that position in the possible actions set
-    for i, row in enumerate(board):
-        for j, cell in enumerate(row):
-            if cell == EMPTY:
-                num_actions.add((i,j))
-
-    return num_actions
+    return set(divmod(cell, SIZE) for cell in Bitboard.from_board(board).free())
 
 
 def result(board, action):
@@ -71,12 +69,9 @@ def result(board, action):
         if not 0 <= element <= 2:
             raise ValueError
 
-    # Determine the current player moving
-    turn = player(board)
-
     # Copy the board and finally make the move in the board copied
-    board_copied = deepcopy(board)
-    board_copied[action[0]][action[1]] = turn
+    board_copied = [list(row) for row in board]
+    board_copied[action[0]][action[1]] = player(board)
 
     return board_copied
 
@@ -85,152 +80,215 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    size = len(board)
-
-    # Place to store rows, columns and diagonals from the current state of the board
-    rows_winner = []
-    diagonals = [[],[]]
-
-    for i in range(size):
-
-        columns = []
-        for j in range(size):
-            # Column
-            columns.append(board[j][i])
-
-            # Diagonal from left to right
-            if i == j:
-                diagonals[0].append(board[i][j])
-            # Diagonal from right to left
-            if j == size - i - 1:
-                diagonals[1].append(board[i][j])
-
-        # Adds the rows in one single list
-        rows_winner.append(columns)
-
-    # Adds the rows in one single list
-    for rows in board:
-        rows_winner.append(rows)
-
-    # Adds the diagonals in one single list
-    for rows in diagonals:
-        rows_winner.append(rows)
-
-    # Analize all posible winning combinations
-    for rows in rows_winner:
-        for i in range(len(rows) - 1):
-            if not rows[i] == rows[i + 1]:
-                break
-            if i == (len(rows) - 2):
-                final_winner = rows[0]
-                return final_winner
-
+    position = Bitboard.from_board(board)
+    if WINNING[position.x]:
+        return X
+    if WINNING[position.o]:
+        return O
     return None
 
+
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    possible_winner = winner(board)
-
-    # The game is over if there is a winner
-    if possible_winner:
-        return True
-
-    cell_available = False
-
-    # The game is not over if are empty cells available
-    for rows in board:
-        for element in rows:
-            if element == EMPTY:
-                cell_available = True
-
-    if cell_available is False:
-        return True
-
-    return False
+    return Bitboard.from_board(board).outcome() is not None
 
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    possible_winner = winner(board)
-
-    # if X is the winner, then the utility is 1
-    if possible_winner == X:
+    position = Bitboard.from_board(board)
+    if WINNING[position.x]:
         return 1
-    # if O is the winner, then the utility is -1
-    if possible_winner == O:
+    if WINNING[position.o]:
         return -1
-
-    # if it's a tie, then the utility is 0
     return 0
 
 
-def minimax(board):
+def minimax(board, alpha_beta=False):
     """
     Returns the optimal action for the current player on the board.
+
+    Boards reachable in a game are answered from the solved-game table.
+    Others are searched, and with `alpha_beta` the search prunes moves
+    that cannot change the result and tries the most promising moves first.
     """
+    position = Bitboard.from_board(board)
+
     # Return none is the game is over
-    if terminal(board):
+    if position.outcome() is not None:
         return None
 
-    current_turn = player(board)
-
-    # Place to store the utility and the actions
-    options = [[],[]]
-
-    # maximizing player
-    if current_turn == X:
-        for action in actions(board):
-            options[0].append(minvalue(result(board,action)))
-            options[1].append(action)
-        # Obtain the maximum utility from every action
-        maxi = max(options[0])
-        for i in range(len(options[0])):
-            # Select one action that have the optimal utility
-            if options[0][i] == maxi:
-                return options[1][i]
-
-    # minimizing player
-    elif current_turn == O:
-        for action in actions(board):
-            options[0].append(maxvalue(result(board,action)))
-            options[1].append(action)
-        # Obtain the minimum utility from every action
-        mini = min(options[0])
-        for i in range(len(options[0])):
-            # Select one action that have the optimal utility
-            if options[0][i] == mini:
-                return options[1][i]
+    if alpha_beta:
+        cell = alphabeta_move(position)
+    else:
+        found = solved.lookup(position.x, position.o)
+        cell = best_move(position) if found is None else found[1]
+    return divmod(cell, SIZE)
 
-    return None
 
 def maxvalue(state):
     """
     choose the maximum value from the minimum value chosen by the opponent
     """
-    value = -math.inf
+    return value(Bitboard.from_board(state, x_to_move=True))
 
-    if terminal(state):
-        return utility(state)
-
-    # Go through every action and selects the maximum value from the minumum value selected by the oponent in the round ahead
-    for action in actions(state):
-        value = max(value,minvalue(result(state, action)))
-    return value
 
 def minvalue(state):
     """
     choose the minimum value from the maximum value chosen by the opponent
     """
-    value = math.inf
+    return value(Bitboard.from_board(state, x_to_move=False))
+
+
+def best_move(position):
+    """
+    Returns the first empty cell of the best value for the side to move.
+    """
+    maximizing = position.x_to_move
+    best_cell = None
+    best_value = None
+
+    for cell in position.free():
+        position.play(cell)
+        cell_value = value(position)
+        position.undo(cell)
+        if best_cell is None or (cell_value > best_value if maximizing else cell_value < best_value):
+            best_cell = cell
+            best_value = cell_value
+
+    return best_cell
+
+
+def value(position):
+    """
+    Minimax value of the position: X chooses the maximum value from the
+    minimum value chosen by O, and the other way round.
+    """
+    nodes["minimax"] += 1
+
+    score = outcome(position.x, position.o)
+    if score is not None:
+        return score
+
+    # A rotation or reflection of this position may have been searched already
+    key = canonical_key(position.x, position.o, position.x_to_move)
+    entry = transpositions.lookup(key)
+    if entry is not None and entry[1] == EXACT:
+        return entry[0]
+
+    maximizing = position.x_to_move
+    best = -math.inf if maximizing else math.inf
+    for cell in position.free():
+        position.play(cell)
+        child = value(position)
+        position.undo(cell)
+        best = max(best, child) if maximizing else min(best, child)
 
-    if terminal(state):
-        return utility(state)
+    transpositions.store(key, best)
+    return best
 
-    # Go through every action and selects the minumum value from the maximum value selected by the oponent in the round ahead
-    for action in actions(state):
-        value = min(value,maxvalue(result(state, action)))
-    return value
+
+def alphabeta_move(position):
+    """
+    Returns the best empty cell for the side to move, searched with
+    alpha-beta pruning.
+    """
+    maximizing = position.x_to_move
+    alpha = -math.inf
+    beta = math.inf
+    best_cell = None
+    best_value = None
+
+    for cell in ordered_moves(position, 0):
+        position.play(cell)
+        cell_value = alphabeta(position, alpha, beta, 1)
+        position.undo(cell)
+
+        # Values no better than the best so far are only bounds, so ties keep the first move
+        if best_cell is None or (cell_value > best_value if maximizing else cell_value < best_value):
+            best_cell = cell
+            best_value = cell_value
+        if maximizing:
+            alpha = max(alpha, cell_value)
+        else:
+            beta = min(beta, cell_value)
+
+        # Nothing beats a won game
+        if best_value == (WIN if maximizing else LOSS):
+            break
+
+    return best_cell
+
+
+def alphabeta(position, alpha=-math.inf, beta=math.inf, ply=0):
+    """
+    Value of the position searched with alpha-beta pruning, `ply` moves
+    below the root. A value at or below alpha is only an upper bound of
+    the true value, and one at or above beta only a lower bound.
+    """
+    nodes["alphabeta"] += 1
+
+    score = outcome(position.x, position.o)
+    if score is not None:
+        return score
+
+    # A rotation or reflection of this position may have been searched
+    # already: its exact value answers, a bound narrows the window
+    key = canonical_key(position.x, position.o, position.x_to_move)
+    entry = transpositions.lookup(key)
+    if entry is not None:
+        stored, bound = entry
+        if bound == EXACT:
+            return stored
+        if bound == LOWER:
+            alpha = max(alpha, stored)
+        else:
+            beta = min(beta, stored)
+        if alpha >= beta:
+            return stored
+
+    maximizing = position.x_to_move
+    lower = alpha
+    upper = beta
+    best = -math.inf if maximizing else math.inf
+
+    for cell in ordered_moves(position, ply):
+        position.play(cell)
+        child = alphabeta(position, alpha, beta, ply + 1)
+        position.undo(cell)
+        if maximizing:
+            best = max(best, child)
+            alpha = max(alpha, best)
+        else:
+            best = min(best, child)
+            beta = min(beta, best)
+
+        # The opponent will never allow this position, or it can't get any better
+        if alpha >= beta or best == (WIN if maximizing else LOSS):
+            killers[ply] = cell
+            history[cell] = history.get(cell, 0) + 2 ** (9 - ply)
+            break
+
+    # Values outside the window are only bounds, unless no game can pass them
+    if best >= upper and best != WIN:
+        transpositions.store(key, best, LOWER)
+    elif best <= lower and best != LOSS:
+        transpositions.store(key, best, UPPER)
+    else:
+        transpositions.store(key, best)
+    return best
+
+
+def ordered_moves(position, ply):
+    """
+    Returns the empty cells, the killer move of this depth first, then
+    the cells that caused the most cutoffs, then by MOVE_ORDER.
+    """
+    killer = killers.get(ply)
+    return sorted(
+        FREE[position.x | position.o],
+        key=lambda cell: (cell != killer, -history.get(cell, 0), MOVE_RANK[cell])
+    )